@@ -0,0 +1,59 @@
+"""
+web_app va bot modullarining import (ishga tushish) vaqti.
+
+    python bench_import.py [--runs 7] [web_app bot]
+
+Har bir o'lchash yangi python jarayonida; natija — mediana (ms) va qaysi
+og'ir kutubxonalar import paytida yuklangani. TELEGRAM_TOKEN/DATABASE_URL
+berilmagan bo'lsa soxta qiymatlar qo'yiladi (import paytida DB'ga ulanilmaydi).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "PIL", "qrcode"]
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": ms, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_TOKEN", "1:bench")
+    env.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1:1/bench")
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    times = []
+    loaded = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        loaded = result["loaded"]
+    return statistics.median(times), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import vaqtini o'lchash")
+    parser.add_argument("modules", nargs="*", default=["web_app", "bot"])
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        ms, loaded = measure(module, args.runs)
+        print(f"{module:10s} {ms:8.1f} ms   og'ir modullar: {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
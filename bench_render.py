@@ -0,0 +1,100 @@
+"""
+Chek rasmini chizish micro-benchmark'i: render_text keshlaridan oldin va keyin.
+
+    python bench_render.py [--items 15] [--runs 50]
+
+"before" — eski _get_font/_measure_text (har chaqiruvda truetype yuklash,
+har safar o'lchash usullarini ketma-ket sinash); "after" — render_text.
+Ikkala holatda ham PNG baytlari bir xil bo'lishi tekshiriladi.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from PIL import ImageFont
+
+import receipt_layout
+import render_text
+
+
+def legacy_get_font(size=16):
+    for path in render_text.FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(path, size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+def legacy_measure_text(draw, text, font):
+    try:
+        bbox = draw.textbbox((0, 0), text, font=font)
+        return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+    except Exception:
+        pass
+    try:
+        size = draw.textsize(text, font=font)
+        return (size[0], size[1])
+    except Exception:
+        pass
+    try:
+        bbox = font.getbbox(text)
+        return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+    except Exception:
+        pass
+    try:
+        size = font.getsize(text)
+        return (size[0], size[1])
+    except Exception:
+        pass
+    return (int(len(text) * (getattr(font, "size", 12) * 0.6)), int(getattr(font, "size", 12) * 1.2))
+
+
+def sample_sale(n_items):
+    sale = {
+        "id": 1042,
+        "total_amount": 0,
+        "payment_type": "naqd",
+        "created_at": datetime(2024, 5, 17, 9, 30),
+        "cust_name": "Aziz Karimov",
+        "cust_phone": "+998901234567",
+    }
+    items = []
+    for i in range(n_items):
+        name = f"Mahsulot {i} " + "juda uzun nomli ehtiyot qism " * (i % 3)
+        qty, price = (i % 4) + 1, 15000 + i * 2500
+        items.append({"name": name, "qty": qty, "price": price, "total": qty * price})
+        sale["total_amount"] += qty * price
+    return sale, items
+
+
+def run(label, n_runs, sale, items):
+    start = time.perf_counter()
+    data = None
+    for _ in range(n_runs):
+        data = receipt_layout.render_receipt_png(sale["id"], sale, items, "+998330131992", paper="80mm")
+    per = (time.perf_counter() - start) / n_runs
+    print(f"{label:>7}: {per * 1000:8.2f} ms/chek  ({n_runs} ta)")
+    return per, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    sale, items = sample_sale(args.items)
+
+    receipt_layout.get_font = legacy_get_font
+    receipt_layout.measure_text = lambda draw, text, font: legacy_measure_text(render_text._SCRATCH, text, font)
+    before, png_before = run("before", args.runs, sale, items)
+
+    receipt_layout.get_font, receipt_layout.measure_text = render_text.get_font, render_text.measure_text
+    after, png_after = run("after", args.runs, sale, items)
+
+    print(f"speedup: {before / after:.2f}x, bir xil PNG: {png_before == png_after}")
+    print(render_text.cache_info())
+
+
+if __name__ == "__main__":
+    main()
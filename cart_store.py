@@ -0,0 +1,160 @@
+"""
+Bot savatchasi (user_carts) — har bir amal bitta SQL so'rov.
+
+- append / remove_last / clear: INSERT ... ON CONFLICT va JSONB patch
+  (butun blob'ni o'qib qayta yozish yo'q), natija RETURNING bilan qaytadi;
+- get: jarayon ichidagi read-through kesh (LRU, CART_CACHE_SECONDS),
+  har bir yozuvda RETURNING qiymati bilan yangilanadi;
+- take(cur, uid): checkout tranzaksiyasi ichida savatchani o'qib o'chiradi
+  (keshdan emas — bir vaqtda ikki checkout bir savatchani sota olmaydi).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from psycopg2.extras import Json
+
+import metrics
+from db import get_conn
+
+
+def parse_cart_data(raw):
+    """DB JSON yoki matn saqlagan bo'lishi mumkin."""
+    if not raw:
+        return {"items": []}
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return {"items": []}
+    if not isinstance(raw, dict):
+        return {"items": []}
+    raw.setdefault("items", [])
+    return raw
+
+
+class CartStore:
+    def __init__(self, cache_seconds=60, max_users=5000):
+        self.cache_seconds = cache_seconds
+        self.max_users = max_users
+        self._cache = OrderedDict()  # uid -> (data, cached_at)
+        self._lock = threading.Lock()
+
+    # --- cache ---
+    def _remember(self, uid, data):
+        with self._lock:
+            self._cache[uid] = (data, time.monotonic())
+            self._cache.move_to_end(uid)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+
+    def _cached(self, uid):
+        with self._lock:
+            item = self._cache.get(uid)
+            if item is None or time.monotonic() - item[1] > self.cache_seconds:
+                return None
+            self._cache.move_to_end(uid)
+            return item[0]
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._cache.pop(uid, None)
+
+    def _run(self, sql, params):
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+        conn.close()
+        return row
+
+    # --- public API ---
+    def get(self, uid):
+        data = self._cached(uid)
+        if data is not None:
+            metrics.incr("cart.cache_hits")
+            return data
+        metrics.incr("cart.cache_misses")
+        row = self._run("SELECT data FROM user_carts WHERE user_id=%s;", (uid,))
+        data = parse_cart_data(row[0] if row else None)
+        self._remember(uid, data)
+        return data
+
+    def items(self, uid):
+        return self.get(uid)["items"]
+
+    def append(self, uid, item):
+        row = self._run(
+            """
+            INSERT INTO user_carts AS c (user_id, data, updated_at)
+            VALUES (%(uid)s, %(data)s, now())
+            ON CONFLICT (user_id) DO UPDATE
+            SET data = jsonb_set(
+                    CASE WHEN jsonb_typeof(c.data) = 'object' THEN c.data ELSE '{}'::jsonb END,
+                    '{items}',
+                    COALESCE(c.data->'items', '[]'::jsonb) || EXCLUDED.data->'items'
+                ),
+                updated_at = now()
+            RETURNING data;
+            """,
+            {"uid": uid, "data": Json({"items": [item]})},
+        )
+        data = parse_cart_data(row[0])
+        self._remember(uid, data)
+        return data
+
+    def remove_last(self, uid):
+        """Qaytaradi: o'chirilgan element (savatcha bo'sh bo'lsa None)."""
+        row = self._run(
+            """
+            UPDATE user_carts c
+            SET data = jsonb_set(c.data, '{items}', (c.data->'items') - -1),
+                updated_at = now()
+            FROM (SELECT user_id, data->'items'->-1 AS removed
+                  FROM user_carts WHERE user_id = %(uid)s FOR UPDATE) old
+            WHERE c.user_id = old.user_id
+              AND jsonb_typeof(c.data->'items') = 'array'
+              AND jsonb_array_length(c.data->'items') > 0
+            RETURNING c.data, old.removed;
+            """,
+            {"uid": uid},
+        )
+        if not row:
+            self._remember(uid, {"items": []})
+            return None
+        self._remember(uid, parse_cart_data(row[0]))
+        return row[1]
+
+    def clear(self, uid):
+        self._run("DELETE FROM user_carts WHERE user_id=%s RETURNING user_id;", (uid,))
+        self._remember(uid, {"items": []})
+
+    def take(self, cur, uid):
+        """
+        Checkout tranzaksiyasi ichida: savatchani o'chiradi va elementlarini
+        qaytaradi. Tranzaksiya rollback bo'lsa savatcha joyida qoladi.
+        """
+        cur.execute("DELETE FROM user_carts WHERE user_id=%s RETURNING data;", (uid,))
+        row = cur.fetchone()
+        self.invalidate(uid)
+        if not row:
+            return []
+        raw = row["data"] if isinstance(row, dict) else row[0]
+        return parse_cart_data(raw)["items"]
+
+    def stats(self):
+        with self._lock:
+            return {"cached_users": len(self._cache)}
+
+
+def from_env():
+    store = CartStore(
+        cache_seconds=float(os.getenv("CART_CACHE_SECONDS", "60")),
+        max_users=int(os.getenv("CART_CACHE_MAX_USERS", "5000")),
+    )
+    metrics.register_gauge("cart", store.stats)
+    return store
@@ -0,0 +1,55 @@
+"""
+CBU kurs API'sining lokal o'rinbosari (oflayn sinov uchun).
+
+    python cbu_stub.py --rate 12650 --port 8765 [--delay 10] [--fail]
+    CBU_RATE_URL=http://127.0.0.1:8765/ python bot.py
+"""
+import argparse
+import json
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(rate, delay, fail):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            if fail:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps([{
+                "id": 69,
+                "Code": "840",
+                "Ccy": "USD",
+                "CcyNm_UZ": "AQSH dollari",
+                "Nominal": "1",
+                "Rate": f"{rate:.2f}",
+                "Diff": "0",
+                "Date": date.today().strftime("%d.%m.%Y"),
+            }]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local CBU USD rate stub")
+    parser.add_argument("--rate", type=float, default=12800.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="javobni kechiktirish (soniya)")
+    parser.add_argument("--fail", action="store_true", help="har doim 503 qaytarish")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.rate, args.delay, args.fail))
+    print(f"CBU stub: http://127.0.0.1:{args.port}/ (rate={args.rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
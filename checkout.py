@@ -0,0 +1,167 @@
+"""
+Sotuvni saqlash (bot va web checkout uchun umumiy).
+
+place_sale(conn, items, ...) chaqiruvchining tranzaksiyasi ichida ishlaydi:
+1) mahsulot qatorlari id tartibida qulflanadi (SELECT ... ORDER BY id FOR
+   UPDATE — umumiy mahsulotli ikki savat deadlock'ka tushmaydi), so'ng ombor
+   qoldig'i bitta `UPDATE ... FROM (VALUES ...)` bilan kamaytiriladi,
+   `qty >= kerak` sharti bilan — bir vaqtda oxirgi donani ikki sotuvchi
+   sota olmaydi (qator lock'i + shart); RETURNING chegaradan (reorder_level)
+   tushganlarni ham beradi — kam qoldiq tekshiruvi qo'shimcha so'rovsiz;
+2) biror mahsulot yetmasa — SAVEPOINT'ga qaytiladi (hech narsa
+   o'zgarmaydi) va CheckoutResult.failed to'ldiriladi;
+3) aks holda sales, sale_items (execute_values), qarz (+ customer_balances)
+   va sales_daily_rollup yoziladi.
+Commit/rollback chaqiruvchida; commit'dan keyin chaqiruvchi committed(result)
+ni chaqiradi — on_commit(fn) bilan ulangan keshlar (dashboard) yangilanadi.
+"""
+from collections import namedtuple
+
+from psycopg2.extras import execute_values
+
+import debt_ledger
+import metrics
+import stats_rollup
+
+# committed(result) chaqirilganda ishlaydigan funksiyalar (on_commit bilan qo'shiladi)
+_COMMIT_LISTENERS = []
+
+CheckoutResult = namedtuple(
+    "CheckoutResult", ["sale_id", "created_at", "total", "failed", "sale", "items", "low_stock"]
+)
+
+# failed: [{"product_id", "name", "needed", "available"}]
+# sale/items: chek uchun tayyor ma'lumot (receipt_text / receipt_layout qayta so'ramasin)
+# low_stock: sotuvdan keyin qty <= reorder_level bo'lib qolgan product_id'lar (stock_alerts.py)
+
+
+def _needed_by_product(items):
+    needed = {}
+    for it in items:
+        pid = it.get("product_id")
+        if pid is not None:
+            needed[int(pid)] = needed.get(int(pid), 0) + int(it["qty"])
+    return needed
+
+
+def _reserve_stock(cur, needed):
+    """Qaytaradi: (yetmagan product_id'lar to'plami, chegaradan tushganlar ro'yxati)."""
+    if not needed:
+        return set(), []
+    # UPDATE ... FROM join tartibida qulflaydi — avval doimiy (id) tartibda
+    cur.execute(
+        "SELECT id FROM products WHERE id = ANY(%s) ORDER BY id FOR UPDATE;",
+        (sorted(needed),),
+    )
+    updated = execute_values(
+        cur,
+        """
+        UPDATE products p
+        SET qty = p.qty - v.needed
+        FROM (VALUES %s) AS v(id, needed)
+        WHERE p.id = v.id AND p.qty >= v.needed
+        RETURNING p.id, p.qty <= p.reorder_level;
+        """,
+        list(needed.items()),
+        template="(%s::int, %s::int)",
+        page_size=len(needed),
+        fetch=True,
+    )
+    low = [row[0] for row in updated if row[1]]
+    return set(needed) - {row[0] for row in updated}, low
+
+
+def failed_items_message(failed):
+    lines = ["Omborda yetarli emas:"]
+    for f in failed:
+        lines.append(f"- {f['name']}: kerak {f['needed']}, mavjud {f['available']}")
+    return "\n".join(lines)
+
+
+def place_sale(conn, items, customer_id, payment_type, seller_phone):
+    with metrics.timed("checkout.seconds"):
+        cur = conn.cursor()
+        try:
+            cur.execute("SAVEPOINT checkout;")
+            needed = _needed_by_product(items)
+            short, low_stock = _reserve_stock(cur, needed)
+            if short:
+                cur.execute("ROLLBACK TO SAVEPOINT checkout;")
+                cur.execute("SELECT id, name, qty FROM products WHERE id = ANY(%s);", (sorted(short),))
+                found = {r[0]: r for r in cur.fetchall()}
+                names = {int(it["product_id"]): it.get("name") for it in items if it.get("product_id") is not None}
+                failed = [
+                    {
+                        "product_id": pid,
+                        "name": found[pid][1] if pid in found else names.get(pid),
+                        "needed": needed[pid],
+                        "available": found[pid][2] if pid in found else 0,
+                    }
+                    for pid in sorted(short)
+                ]
+                metrics.incr("checkout.stock_conflicts")
+                return CheckoutResult(None, None, 0, failed, None, [], [])
+
+            total = sum(int(it["qty"]) * int(it["price"]) for it in items)
+            cur.execute(
+                """
+                WITH ins AS (
+                    INSERT INTO sales (customer_id, total_amount, payment_type, seller_phone)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id, created_at, customer_id
+                )
+                SELECT ins.id, ins.created_at, c.name, c.phone
+                FROM ins LEFT JOIN customers c ON c.id = ins.customer_id;
+                """,
+                (customer_id, total, payment_type, seller_phone),
+            )
+            sale_id, created_at, cust_name, cust_phone = cur.fetchone()
+
+            lines = [
+                {"product_id": it.get("product_id"), "name": it["name"], "qty": int(it["qty"]),
+                 "price": int(it["price"]), "total": int(it["qty"]) * int(it["price"])}
+                for it in items
+            ]
+            execute_values(
+                cur,
+                "INSERT INTO sale_items (sale_id, product_id, name, qty, price, total) VALUES %s;",
+                [(sale_id, l["product_id"], l["name"], l["qty"], l["price"], l["total"]) for l in lines],
+                page_size=max(len(lines), 1),
+            )
+
+            if payment_type == "qarz":
+                cur.execute(
+                    "INSERT INTO debts (customer_id, sale_id, amount) VALUES (%s, %s, %s) RETURNING created_at;",
+                    (customer_id, sale_id, total),
+                )
+                debt_ledger.record_debt(cur, customer_id, total, cur.fetchone()[0])
+
+            stats_rollup.record_sale(cur, sale_id)
+            cur.execute("RELEASE SAVEPOINT checkout;")
+            metrics.incr("checkout.sales")
+            sale = {
+                "id": sale_id,
+                "total_amount": total,
+                "payment_type": payment_type,
+                "created_at": created_at,
+                "cust_name": cust_name,
+                "cust_phone": cust_phone,
+            }
+            return CheckoutResult(sale_id, created_at, total, [], sale, lines, low_stock)
+        finally:
+            cur.close()
+
+
+def on_commit(fn):
+    """fn(result) — har bir sotuv commit qilingandan keyin chaqiriladi."""
+    _COMMIT_LISTENERS.append(fn)
+    return fn
+
+
+def committed(result):
+    """Chaqiruvchi conn.commit()'dan keyin. Listener xatosi sotuvga ta'sir qilmaydi."""
+    for fn in list(_COMMIT_LISTENERS):
+        try:
+            fn(result)
+        except Exception as e:
+            print("checkout on_commit xatosi:", e)
@@ -0,0 +1,11 @@
+"""
+bot.py va web_app.py uchun umumiy kod.
+
+- core.text: format_money, contains_cyrillic, now_str
+- core.periods: hisobot davrlari (kunlik/oylik/yillik)
+- core.reports: statistika va bitta sotuv Excel hisobotlari
+- core.receipts: chek matni, chek rasmi keshi
+- core.lazy: og'ir kutubxonalarni (pandas, openpyxl, PIL) birinchi
+  ishlatilganda import qilish — web/worker jarayonlari tezroq ishga tushadi
+  (o'lchash: python bench_import.py)
+"""
@@ -0,0 +1,27 @@
+"""
+Og'ir modullarni kechiktirib import qilish.
+
+    pd = lazy_import("pandas")   # hali import qilinmagan
+    pd.DataFrame(...)            # birinchi atributda import bo'ladi
+"""
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
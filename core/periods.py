@@ -0,0 +1,51 @@
+import os
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+
+def local_tz_name():
+    """TIMEZONE nomi (SQL'dagi AT TIME ZONE uchun)."""
+    return os.getenv("TIMEZONE", "Asia/Tashkent")
+
+
+def local_tz():
+    try:
+        return ZoneInfo(local_tz_name())
+    except Exception:
+        return timezone(timedelta(hours=5))
+
+
+def local_today():
+    return datetime.now(local_tz()).date()
+
+
+def day_range(day):
+    """Mahalliy kun [00:00, ertasi 00:00) — tz-aware."""
+    tz = local_tz()
+    start = datetime.combine(day, time.min).replace(tzinfo=tz)
+    return start, start + timedelta(days=1)
+
+
+def day_range_utc(day):
+    """Mahalliy kun -> naive UTC oraliq (sales.created_at bilan solishtirish uchun)."""
+    start, end = day_range(day)
+    return (start.astimezone(timezone.utc).replace(tzinfo=None),
+            end.astimezone(timezone.utc).replace(tzinfo=None))
+
+
+def period_range(period_key):
+    """"daily" | "monthly" | "yearly" -> (start, end), mahalliy vaqtda (tz-aware)."""
+    tz = local_tz()
+    today = datetime.now(tz).date()
+    if period_key == "daily":
+        return day_range(today)
+    if period_key == "monthly":
+        start = date(today.year, today.month, 1)
+        end = date(today.year + 1, 1, 1) if today.month == 12 else date(today.year, today.month + 1, 1)
+    elif period_key == "yearly":
+        start = date(today.year, 1, 1)
+        end = date(today.year + 1, 1, 1)
+    else:
+        raise ValueError("Unknown period")
+    return (datetime.combine(start, time.min).replace(tzinfo=tz),
+            datetime.combine(end, time.min).replace(tzinfo=tz))
@@ -0,0 +1,144 @@
+"""
+Chek: matn ko'rinishi va rasm (PNG/ESC-POS) keshi — bot va web uchun umumiy.
+
+- sale/items checkout'dan berilsa DB qayta so'ralmaydi.
+- RECEIPT_CACHE bitta jarayonda bitta (web ichida bot webhook'i ishlasa ham).
+- receipt_layout (Pillow, qrcode) birinchi chek chizilganda yuklanadi.
+- Sozlamalar (.env): SELLER_NAME, SELLER_PHONE, STORE_LOCATION_NAME —
+  chaqiruv paytida o'qiladi (load_dotenv importlardan keyin ishlaydi).
+"""
+import io
+import os
+import threading
+from datetime import datetime, timezone
+
+from psycopg2.extras import RealDictCursor
+
+import receipt_cache
+from core.periods import local_tz
+from core.text import format_money, now_str
+from db import get_conn
+
+# Chek rasmlari keshi (xotira LRU + ixtiyoriy RECEIPT_CACHE_DIR)
+RECEIPT_CACHE = receipt_cache.from_env()
+
+
+def _seller():
+    return os.getenv("SELLER_NAME", ""), os.getenv("SELLER_PHONE", "+998330131992")
+
+
+def load_sale(sale_id):
+    """Qaytaradi: (sale, items) — sotuv topilmasa (None, [])."""
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT s.id, s.total_amount, s.payment_type, s.created_at,
+               c.name AS cust_name, c.phone AS cust_phone
+        FROM sales s
+        LEFT JOIN customers c ON s.customer_id = c.id
+        WHERE s.id = %s;
+    """, (sale_id,))
+    sale = cur.fetchone()
+    items = []
+    if sale:
+        cur.execute("""
+            SELECT name, qty, price, total
+            FROM sale_items
+            WHERE sale_id = %s
+            ORDER BY id;
+        """, (sale_id,))
+        items = cur.fetchall()
+    cur.close()
+    conn.close()
+    return sale, items
+
+
+def receipt_text(sale_id, sale=None, items=None):
+    """
+    Chek matn ko‘rinishida yuboriladigan versiya.
+    (Agar rasm chiqmasa, matn sifatida yuboriladi.)
+    """
+    if sale is None:
+        sale, items = load_sale(sale_id)
+    if not sale:
+        return "Sotuv topilmadi."
+
+    created_at = sale.get("created_at")
+    if isinstance(created_at, datetime):
+        # sales.created_at — UTC (naive)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        created_at = created_at.astimezone(local_tz())
+
+    seller_name, seller_phone = _seller()
+    seller_display = f"{seller_name} {seller_phone}" if seller_name else f"{seller_phone}"
+    store_name = os.getenv("STORE_LOCATION_NAME", "Do'kon")
+
+    lines = [
+        f"🧾 Chek №{sale_id}",
+        f"📅 Sana: {created_at.strftime('%d.%m.%Y %H:%M:%S') if created_at else now_str()}",
+        f"🏬 Do‘kon: {store_name}",
+        f"👨‍💼 Sotuvchi: {seller_display}",
+        f"👤 Mijoz: {sale.get('cust_name') or '-'} {sale.get('cust_phone') or ''}",
+        "────────────────────────────",
+    ]
+    for it in items or []:
+        lines.append(f"{it.get('name')} — {it.get('qty')} x {format_money(it.get('price'))} = {format_money(it.get('total'))}")
+    lines.extend([
+        "────────────────────────────",
+        f"💰 Jami: {format_money(sale.get('total_amount') or 0)}",
+        f"💳 To‘lov turi: {sale.get('payment_type')}",
+        "────────────────────────────",
+        "Tashrifingiz uchun rahmat! ❤️",
+    ])
+    return "\n".join(lines)
+
+
+def _draw_receipt_png(sale_id, sale, items):
+    import receipt_layout
+
+    seller_name, seller_phone = _seller()
+    seller_display = f"{seller_name} ({seller_phone})" if seller_name else f"{seller_phone}"
+    return receipt_layout.render_receipt_png(sale_id, sale, items, seller_display)
+
+
+def _render_receipt_png(sale_id):
+    sale, items = load_sale(sale_id)
+    if not sale:
+        return None
+    return _draw_receipt_png(sale_id, sale, items)
+
+
+def receipt_entry(sale_id, sale=None, items=None):
+    """Keshdagi chek (CachedReceipt) yoki None — sotuv topilmasa."""
+    if sale is not None:
+        render = lambda: _draw_receipt_png(sale_id, sale, items)
+    else:
+        render = lambda: _render_receipt_png(sale_id)
+    return RECEIPT_CACHE.get_or_render(sale_id, render)
+
+
+def receipt_image_bytes(sale_id, sale=None, items=None):
+    """Keshdagi chek rasmi (BytesIO) yoki None — sotuv topilmasa."""
+    entry = receipt_entry(sale_id, sale, items)
+    if entry is None:
+        return None
+    return entry.as_file(f"receipt_{sale_id}.png")
+
+
+def receipt_escpos(entry):
+    """Keshdagi PNG dan ESC/POS raster (BytesIO)."""
+    import receipt_layout
+
+    return io.BytesIO(receipt_layout.escpos_raster(entry.data))
+
+
+def warm_receipt_cache(sale_id, sale=None, items=None):
+    """Checkout commit'dan keyin chekni oldindan chizib qo'yadi (fon oqimida)."""
+    def run():
+        try:
+            receipt_entry(sale_id, sale, items)
+        except Exception as e:
+            print("Chek keshini isitishda xato:", e)
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,96 @@
+"""
+Statistika va sotuv bo'yicha Excel hisobotlar (bot va web uchun umumiy).
+pandas/openpyxl birinchi hisobotda yuklanadi. So'rovlar db.get_read_conn()
+orqali — DATABASE_REPLICA_URL berilsa replikadan o'qiladi.
+"""
+import io
+from datetime import datetime
+
+from psycopg2.extras import RealDictCursor
+
+import stats_rollup
+from core.lazy import lazy_import
+from db import get_read_conn
+
+pd = lazy_import("pandas")
+
+
+def generate_stats_df(start_dt, end_dt):
+    # o'tgan kunlar sales_daily_rollup'dan, bugun jonli (stats_rollup.py)
+    return stats_rollup.generate_stats_df(start_dt, end_dt)
+
+
+def make_excel_from_df(df, title, start_dt, end_dt):
+    out = io.BytesIO()
+    with pd.ExcelWriter(out, engine="openpyxl") as writer:
+        meta = pd.DataFrame([{
+            "Hisobot": title,
+            "Sana boshi": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "Sana oxiri": end_dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "Yaratildi": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }])
+        meta.to_excel(writer, index=False, sheet_name="Meta")
+        if df.empty:
+            pd.DataFrame([{"Xabar": "Ushbu davrda hech qanday mahsulot sotilmagan."}]).to_excel(
+                writer, index=False, sheet_name="Hisobot"
+            )
+        else:
+            df.to_excel(writer, index=False, sheet_name="Hisobot")
+            ws = writer.sheets["Hisobot"]
+            # bitta bo'sh qatordan keyin jami (exports.write_xlsx kabi)
+            start_row = len(df) + 3
+            ws.cell(row=start_row, column=2, value="Jami")
+            ws.cell(row=start_row, column=3, value=int(df["sold_qty"].sum()))
+            ws.cell(row=start_row, column=5, value=int(df["total_sold"].sum()))
+            ws.cell(row=start_row, column=6, value=int(df["total_cost"].sum()))
+            ws.cell(row=start_row, column=7, value=int(df["profit"].sum()))
+    out.seek(0)
+    return out
+
+
+def generate_sale_excel(sale_id):
+    """Bitta sotuv (Sale + Items varaqlari). Qaytaradi: BytesIO yoki None — sotuv topilmasa."""
+    conn = get_read_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT s.id AS sale_id, s.created_at, s.total_amount, s.payment_type, c.name as cust_name, c.phone as cust_phone
+        FROM sales s
+        LEFT JOIN customers c ON c.id = s.customer_id
+        WHERE s.id = %s;
+    """, (sale_id,))
+    sale = cur.fetchone()
+    if not sale:
+        cur.close()
+        conn.close()
+        return None
+    cur.execute("""
+        SELECT si.product_id, si.name, si.qty, si.price, si.total, COALESCE(p.cost_price,0) AS cost_price
+        FROM sale_items si
+        LEFT JOIN products p ON p.id = si.product_id
+        WHERE si.sale_id = %s;
+    """, (sale_id,))
+    items = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    out = io.BytesIO()
+    with pd.ExcelWriter(out, engine="openpyxl") as writer:
+        sale_meta = pd.DataFrame([{
+            "Sale ID": sale["sale_id"],
+            "Sana": sale["created_at"].strftime("%Y-%m-%d %H:%M:%S") if sale["created_at"] else "",
+            "Mijoz": sale.get("cust_name") or "",
+            "Telefon": sale.get("cust_phone") or "",
+            "To'lov turi": sale.get("payment_type") or "",
+            "Jami summa": sale.get("total_amount") or 0,
+        }])
+        sale_meta.to_excel(writer, index=False, sheet_name="Sale")
+        if not items:
+            pd.DataFrame([{"Xabar": "Ushbu chekda elementlar yo'q"}]).to_excel(writer, index=False, sheet_name="Items")
+        else:
+            pd.DataFrame(items).to_excel(writer, index=False, sheet_name="Items")
+    out.seek(0)
+    return out
+
+
+def sale_excel_filename(sale_id):
+    return f"chek_{sale_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
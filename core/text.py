@@ -0,0 +1,24 @@
+import re
+from datetime import datetime
+
+from core.periods import local_tz
+
+CYRILLIC_PATTERN = re.compile(r'[А-Яа-яЁёҢғқўҳ]', flags=re.UNICODE)
+
+
+def contains_cyrillic(text: str):
+    if not isinstance(text, str):
+        return False
+    return bool(CYRILLIC_PATTERN.search(text))
+
+
+def format_money(value):
+    try:
+        return f"{int(value):,}".replace(",", ".") + " so'm"
+    except Exception:
+        return str(value)
+
+
+def now_str():
+    dt = datetime.now(local_tz()).replace(microsecond=0)
+    return dt.strftime("%d.%m.%Y %H:%M:%S")
@@ -0,0 +1,123 @@
+"""
+Dashboard ko'rsatkichlari (/api/dashboard): bugungi tushum, foyda va sotuvlar
+soni, kam qolgan mahsulotlar, qarz qoldig'i, ombor qiymati.
+
+- Bitta so'rov, faqat indeksli o'qishlar: bugungi sales (idx_sales_created_at)
+  va ularning sale_items'i, kam qolganlar va customer_balances (qisman indekslar),
+  stock_valuation_slots (16 qator). generate_stats_df ishlatilmaydi.
+- Jarayon ichidagi TTL kesh (DASHBOARD_CACHE_TTL, default 15 s). Shu jarayondagi
+  checkout (checkout.on_commit) va qarz to'lovi keshni darhol bekor qiladi;
+  boshqa jarayondagi (bot) sotuvlar TTL ichida ko'rinadi.
+- Primary'dan o'qiladi (replika lag'i invalidatsiyani bekor qilmasin).
+- ETag — qiymatlar xeshi: o'zgarish bo'lmasa so'rovchi 304 oladi.
+- "Kam qolgan": qty <= reorder_level (idx_products_low_stock qisman indeksi).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from psycopg2.extras import RealDictCursor
+
+import checkout
+import metrics
+from core.periods import day_range_utc, local_tz
+from db import get_conn
+
+_KPI_SQL = """
+    WITH today AS (
+        SELECT id, total_amount
+        FROM sales
+        WHERE created_at >= %(start)s AND created_at < %(end)s
+    ),
+    stock AS (
+        SELECT SUM(value) AS value, SUM(value_usd) AS value_usd, SUM(total_qty) AS total_qty
+        FROM stock_valuation_slots
+    )
+    SELECT
+        (SELECT COUNT(*) FROM today) AS sales_count,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM today) AS revenue,
+        (SELECT COALESCE(SUM(si.total - si.qty * COALESCE(p.cost_price, 0)), 0)
+         FROM today t
+         JOIN sale_items si ON si.sale_id = t.id
+         LEFT JOIN products p ON p.id = si.product_id) AS profit,
+        (SELECT COUNT(*) FROM products WHERE qty <= reorder_level) AS low_stock,
+        (SELECT COALESCE(SUM(balance), 0) FROM customer_balances WHERE balance > 0) AS outstanding_debt,
+        (SELECT COUNT(*) FROM customer_balances WHERE balance > 0) AS debtors,
+        (SELECT value FROM stock) AS stock_value,
+        (SELECT value_usd FROM stock) AS stock_value_usd,
+        (SELECT total_qty FROM stock) AS stock_qty;
+"""
+
+_LOCK = threading.Lock()
+_REFRESH_LOCK = threading.Lock()
+_CACHE = {"value": None, "etag": None, "expires": 0.0, "generation": 0}
+
+
+def _ttl():
+    return float(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+
+
+def _query():
+    today = datetime.now(local_tz()).date()
+    start, end = day_range_utc(today)
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(_KPI_SQL, {"start": start, "end": end})
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return {
+        "day": today.isoformat(),
+        "revenue": int(row["revenue"]),
+        "profit": int(row["profit"]),
+        "sales_count": int(row["sales_count"]),
+        "low_stock": int(row["low_stock"]),
+        "outstanding_debt": int(row["outstanding_debt"]),
+        "debtors": int(row["debtors"]),
+        "stock_value": int(row["stock_value"] or 0),
+        "stock_value_usd": float(row["stock_value_usd"] or 0),
+        "stock_qty": int(row["stock_qty"] or 0),
+    }
+
+
+def _cached():
+    with _LOCK:
+        if _CACHE["value"] is not None and time.monotonic() < _CACHE["expires"]:
+            return _CACHE["value"], _CACHE["etag"], None
+        return None, None, _CACHE["generation"]
+
+
+def snapshot():
+    """Qaytaradi: (ko'rsatkichlar dict, etag)."""
+    value, etag, _ = _cached()
+    if value is not None:
+        metrics.incr("dashboard.hits")
+        return value, etag
+    # bir vaqtda kelgan so'rovlardan faqat bittasi bazaga boradi
+    with _REFRESH_LOCK:
+        value, etag, generation = _cached()
+        if value is not None:
+            metrics.incr("dashboard.hits")
+            return value, etag
+        metrics.incr("dashboard.misses")
+        with metrics.timed("dashboard.query_seconds"):
+            value = _query()
+        etag = hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+        with _LOCK:
+            # so'rov paytida invalidate bo'lgan bo'lsa — keshlanmaydi
+            if _CACHE["generation"] == generation:
+                _CACHE.update(value=value, etag=etag, expires=time.monotonic() + _ttl())
+        return value, etag
+
+
+def invalidate(*_):
+    with _LOCK:
+        _CACHE["generation"] += 1
+        _CACHE["expires"] = 0.0
+    metrics.incr("dashboard.invalidations")
+
+
+checkout.on_commit(invalidate)
@@ -185,6 +185,260 @@ ALTER TABLE web_users
 ALTER TABLE web_users
   ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
 
+-- =========================
+-- BOT STATE (state_store.py, BOT_STATE_BACKEND=postgres)
+-- UNLOGGED: tez yoziladi, server crash'da tozalanadi (suhbat holati uchun yetarli)
+-- =========================
+CREATE UNLOGGED TABLE IF NOT EXISTS bot_state (
+  user_id BIGINT PRIMARY KEY,
+  data JSONB NOT NULL DEFAULT '{}'::jsonb,
+  updated_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')
+);
+
+CREATE INDEX IF NOT EXISTS idx_bot_state_updated_at ON bot_state (updated_at);
+
+-- =========================
+-- USD RATES (CBU kurs tarixi)
+-- =========================
+CREATE TABLE IF NOT EXISTS usd_rates (
+  id SERIAL PRIMARY KEY,
+  rate_date DATE NOT NULL UNIQUE,
+  rate NUMERIC(12,2) NOT NULL,
+  fetched_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+  source TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_usd_rates_fetched_at ON usd_rates (fetched_at);
+
+-- =========================
+-- SALES DAILY ROLLUP (statistika uchun)
+-- product_id = 0: mahsulot o'chirilgan (sale_items.product_id NULL)
+-- birinchi to'ldirish init_db'da (stats_rollup.seed_if_empty — TIMEZONE kerak);
+-- qayta hisoblash: python stats_rollup.py backfill
+-- =========================
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+  day DATE NOT NULL,
+  product_id INTEGER NOT NULL DEFAULT 0,
+  name TEXT NOT NULL DEFAULT '',
+  qty BIGINT NOT NULL DEFAULT 0,
+  revenue BIGINT NOT NULL DEFAULT 0,
+  cost BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT now(),
+  PRIMARY KEY (day, product_id, name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_daily_rollup_product ON sales_daily_rollup (product_id, day);
+
+-- =========================
+-- DEBT LEDGER (debt_ledger.py)
+-- debt_payments: qarz to'lovlari; customer_balances: mijoz bo'yicha qoldiq,
+-- checkout va to'lovda inkremental yangilanadi.
+-- qayta hisoblash: python debt_ledger.py rebuild
+-- =========================
+CREATE TABLE IF NOT EXISTS debt_payments (
+  id SERIAL PRIMARY KEY,
+  customer_id INTEGER NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+  amount BIGINT NOT NULL CHECK (amount > 0),
+  note TEXT,
+  created_by TEXT,
+  created_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_debt_payments_customer ON debt_payments (customer_id, created_at);
+
+CREATE TABLE IF NOT EXISTS customer_balances (
+  customer_id INTEGER PRIMARY KEY REFERENCES customers(id) ON DELETE CASCADE,
+  debt_total BIGINT NOT NULL DEFAULT 0,
+  paid_total BIGINT NOT NULL DEFAULT 0,
+  balance BIGINT GENERATED ALWAYS AS (debt_total - paid_total) STORED,
+  oldest_unpaid_at TIMESTAMP,
+  last_debt_at TIMESTAMP,
+  last_payment_at TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT now()
+);
+
+-- top qarzdorlar / muddati o'tganlar: faqat qoldig'i borlar indekslanadi
+CREATE INDEX IF NOT EXISTS idx_customer_balances_top
+  ON customer_balances (balance DESC, customer_id DESC) WHERE balance > 0;
+CREATE INDEX IF NOT EXISTS idx_customer_balances_overdue
+  ON customer_balances (oldest_unpaid_at, customer_id) WHERE balance > 0;
+
+-- birinchi ishga tushirishda: mavjud qarzlardan to'ldirish (to'lovlar hali yo'q)
+INSERT INTO customer_balances (customer_id, debt_total, oldest_unpaid_at, last_debt_at)
+SELECT d.customer_id, SUM(d.amount), MIN(d.created_at), MAX(d.created_at)
+FROM debts d
+WHERE d.customer_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM customer_balances)
+  AND NOT EXISTS (SELECT 1 FROM debt_payments)
+GROUP BY d.customer_id;
+
+-- =========================
+-- STOCK VALUATION (stock_valuation.py)
+-- products.stock_value(_usd): qty x tannarx; stock_valuation_slots: jami
+-- (mahsulotlar, qoldiq, qiymat) 16 ta slotga bo'lingan, haqiqiy jami — SUM.
+-- products'dagi har bir INSERT/UPDATE/DELETE statement'i oxirida delta
+-- pg_backend_pid() % 16 slotiga qo'shiladi: parallel checkout/importlar bitta
+-- qator lock'ida navbat kutmaydi (checkout, Excel import, qo'lda qo'shish —
+-- hammasi shu trigger orqali).
+-- qayta hisoblash: python stock_valuation.py rebuild
+-- =========================
+ALTER TABLE products
+  ADD COLUMN IF NOT EXISTS stock_value_usd NUMERIC(16,2) GENERATED ALWAYS AS (qty * cost_price_usd) STORED;
+
+ALTER TABLE products
+  ADD COLUMN IF NOT EXISTS stock_value BIGINT GENERATED ALWAYS AS (qty::BIGINT * cost_price) STORED;
+
+CREATE TABLE IF NOT EXISTS stock_valuation_slots (
+  slot SMALLINT PRIMARY KEY CHECK (slot >= 0 AND slot < 16),
+  products INTEGER NOT NULL DEFAULT 0,
+  in_stock INTEGER NOT NULL DEFAULT 0,
+  total_qty BIGINT NOT NULL DEFAULT 0,
+  value_usd NUMERIC(18,2) NOT NULL DEFAULT 0,
+  value BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION stock_valuation_add(
+  d_products BIGINT, d_in_stock BIGINT, d_qty BIGINT, d_usd NUMERIC, d_value NUMERIC
+) RETURNS void
+LANGUAGE sql AS $$
+  INSERT INTO stock_valuation_slots AS s (slot, products, in_stock, total_qty, value_usd, value)
+  VALUES (pg_backend_pid() % 16, d_products, d_in_stock, d_qty, d_usd, d_value)
+  ON CONFLICT (slot) DO UPDATE
+  SET products = s.products + EXCLUDED.products,
+      in_stock = s.in_stock + EXCLUDED.in_stock,
+      total_qty = s.total_qty + EXCLUDED.total_qty,
+      value_usd = s.value_usd + EXCLUDED.value_usd,
+      value = s.value + EXCLUDED.value,
+      updated_at = now();
+$$;
+
+CREATE OR REPLACE FUNCTION stock_valuation_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM stock_valuation_add(COUNT(*), COUNT(*) FILTER (WHERE qty > 0), COALESCE(SUM(qty), 0),
+                                COALESCE(SUM(stock_value_usd), 0), COALESCE(SUM(stock_value), 0))
+    FROM new_rows
+    HAVING COUNT(*) > 0;
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM stock_valuation_add(-COUNT(*), -COUNT(*) FILTER (WHERE qty > 0), -COALESCE(SUM(qty), 0),
+                                -COALESCE(SUM(stock_value_usd), 0), -COALESCE(SUM(stock_value), 0))
+    FROM old_rows
+    HAVING COUNT(*) > 0;
+  ELSE
+    -- faqat nom o'zgargan bo'lsa slot qatori qulflanmaydi
+    PERFORM stock_valuation_add(0, n.in_stock - o.in_stock, n.qty - o.qty, n.usd - o.usd, n.value - o.value)
+    FROM (SELECT COUNT(*) FILTER (WHERE qty > 0) AS in_stock, COALESCE(SUM(qty), 0) AS qty,
+                 COALESCE(SUM(stock_value_usd), 0) AS usd, COALESCE(SUM(stock_value), 0) AS value
+          FROM new_rows) n,
+         (SELECT COUNT(*) FILTER (WHERE qty > 0) AS in_stock, COALESCE(SUM(qty), 0) AS qty,
+                 COALESCE(SUM(stock_value_usd), 0) AS usd, COALESCE(SUM(stock_value), 0) AS value
+          FROM old_rows) o
+    WHERE (n.in_stock, n.qty, n.usd, n.value) IS DISTINCT FROM (o.in_stock, o.qty, o.usd, o.value);
+  END IF;
+  RETURN NULL;
+END $$;
+
+-- trigger'lar faqat yo'q bo'lsa yaratiladi: DROP/CREATE TRIGGER products'ni
+-- ACCESS EXCLUSIVE bilan qulflaydi, init_db esa har ishga tushishda ishlaydi
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                 WHERE tgrelid = 'products'::regclass AND tgname = 'trg_stock_valuation_insert') THEN
+    CREATE TRIGGER trg_stock_valuation_insert
+      AFTER INSERT ON products
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION stock_valuation_apply();
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                 WHERE tgrelid = 'products'::regclass AND tgname = 'trg_stock_valuation_update') THEN
+    CREATE TRIGGER trg_stock_valuation_update
+      AFTER UPDATE ON products
+      REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION stock_valuation_apply();
+  END IF;
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                 WHERE tgrelid = 'products'::regclass AND tgname = 'trg_stock_valuation_delete') THEN
+    CREATE TRIGGER trg_stock_valuation_delete
+      AFTER DELETE ON products
+      REFERENCING OLD TABLE AS old_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION stock_valuation_apply();
+  END IF;
+END $$;
+
+-- birinchi ishga tushirishda to'ldirish (jami 0-slotga, qolganlari 0). SHARE lock
+-- yozuvchilarni kutdiradi; lock'dan oldin tushgan delta'lar ham qayta yoziladi.
+-- Keyingi ishga tushishlarda (slotlar bor) lock olinmaydi.
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM stock_valuation_slots) THEN
+    LOCK TABLE products IN SHARE MODE;
+    INSERT INTO stock_valuation_slots AS v (slot, products, in_stock, total_qty, value_usd, value, updated_at)
+    SELECT g.slot,
+           CASE WHEN g.slot = 0 THEN t.products ELSE 0 END,
+           CASE WHEN g.slot = 0 THEN t.in_stock ELSE 0 END,
+           CASE WHEN g.slot = 0 THEN t.total_qty ELSE 0 END,
+           CASE WHEN g.slot = 0 THEN t.value_usd ELSE 0 END,
+           CASE WHEN g.slot = 0 THEN t.value ELSE 0 END,
+           now()
+    FROM generate_series(0, 15) AS g(slot),
+         (SELECT COUNT(*) AS products, COUNT(*) FILTER (WHERE qty > 0) AS in_stock,
+                 COALESCE(SUM(qty), 0) AS total_qty, COALESCE(SUM(stock_value_usd), 0) AS value_usd,
+                 COALESCE(SUM(stock_value), 0) AS value
+          FROM products) AS t
+    ON CONFLICT (slot) DO UPDATE
+    SET products = EXCLUDED.products,
+        in_stock = EXCLUDED.in_stock,
+        total_qty = EXCLUDED.total_qty,
+        value_usd = EXCLUDED.value_usd,
+        value = EXCLUDED.value,
+        updated_at = EXCLUDED.updated_at;
+  END IF;
+END $$;
+
+-- =========================
+-- LOW STOCK ALERTS (stock_alerts.py)
+-- reorder_level: mahsulot bo'yicha chegara, qty <= reorder_level — "kam qolgan".
+-- low_stock_alerts: xabar qilingan mahsulotlar (de-dup). Kirimdan keyin qoldiq
+-- chegaradan oshsa yozuv trigger bilan o'chadi — keyingi tushishda yana xabar.
+-- =========================
+ALTER TABLE products
+  ADD COLUMN IF NOT EXISTS reorder_level INTEGER NOT NULL DEFAULT 5;
+
+-- dashboard: kam qolganlar soni (faqat shu qatorlar indekslanadi)
+CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products (id) WHERE qty <= reorder_level;
+
+CREATE TABLE IF NOT EXISTS low_stock_alerts (
+  product_id INTEGER PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+  qty INTEGER NOT NULL,
+  reorder_level INTEGER NOT NULL,
+  alerted_at TIMESTAMP DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION low_stock_alerts_reset() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM low_stock_alerts) THEN
+    DELETE FROM low_stock_alerts a
+    USING new_rows n
+    WHERE a.product_id = n.id AND n.qty > n.reorder_level;
+  END IF;
+  RETURN NULL;
+END $$;
+
+-- faqat yo'q bo'lsa (har ishga tushishda products'ga ACCESS EXCLUSIVE olinmasin)
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger
+                 WHERE tgrelid = 'products'::regclass AND tgname = 'trg_low_stock_alerts_reset') THEN
+    CREATE TRIGGER trg_low_stock_alerts_reset
+      AFTER UPDATE ON products
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION low_stock_alerts_reset();
+  END IF;
+END $$;
+
 -- =========================
 -- FIX: sales.user_id nullable
 -- =========================
@@ -199,6 +453,30 @@ ALTER TABLE sales
 -- =========================
 CREATE INDEX IF NOT EXISTS idx_products_name ON products (name);
 CREATE INDEX IF NOT EXISTS idx_products_qty ON products (qty);
+-- Excel import upsert kaliti: (lower(name), cost_price_usd)
+CREATE INDEX IF NOT EXISTS idx_products_lower_name_cost ON products (lower(name), cost_price_usd);
+
+-- Mahsulot qidiruvi (product_search.py): kichik harf, apostroflarsiz kalit + pg_trgm.
+-- pg_trgm o'rnatib bo'lmasa (huquq yo'q) — qidiruv jarayon ichidagi indeksga o'tadi.
+CREATE OR REPLACE FUNCTION product_search_key(t TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT btrim(regexp_replace(translate(lower(coalesce(t, '')), '''`‘’ʻʼ', ''), '\s+', ' ', 'g'))
+$$;
+
+DO $$
+BEGIN
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+  RAISE NOTICE 'pg_trgm o''rnatilmadi: %', SQLERRM;
+END $$;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+    CREATE INDEX IF NOT EXISTS idx_products_search_trgm
+      ON products USING gin (product_search_key(name) gin_trgm_ops);
+  END IF;
+END $$;
 
 CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone);
 
@@ -210,3 +488,4 @@ CREATE INDEX IF NOT EXISTS idx_sale_items_product_id ON sale_items (product_id);
 
 CREATE INDEX IF NOT EXISTS idx_debts_customer_id ON debts (customer_id);
 CREATE INDEX IF NOT EXISTS idx_debts_sale_id ON debts (sale_id);
+CREATE INDEX IF NOT EXISTS idx_debts_created_at_id ON debts (created_at DESC, id DESC);
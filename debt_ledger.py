@@ -0,0 +1,216 @@
+"""
+Qarz daftari: to'lovlar (debt_payments) va mijoz bo'yicha qoldiq (customer_balances).
+
+- record_debt(cur, ...): checkout tranzaksiyasi ichida, qarzga sotuvdan keyin
+  mijoz qoldig'ini oshiradi.
+- record_payment(conn, ...): to'lovni yozadi, qoldiqni kamaytiradi.
+  Qoldiqdan ortiq to'lov qabul qilinmaydi (PaymentError).
+- oldest_unpaid_at — FIFO bo'yicha hali to'lanmagan eng eski qarz sanasi
+  ("muddati o'tgan" ro'yxati shu ustun bo'yicha, DEBT_OVERDUE_DAYS, default 30).
+- Ro'yxatlar customer_balances'dan o'qiladi (listings.debtors_page) —
+  debts jadvali o'sgani sari sekinlashmaydi.
+- Qayta hisoblash (debts + debt_payments'dan):
+      python debt_ledger.py rebuild
+"""
+import argparse
+import os
+
+from psycopg2.extras import RealDictCursor
+
+import metrics
+from db import get_conn
+
+OVERDUE_DAYS = int(os.getenv("DEBT_OVERDUE_DAYS", "30"))
+
+
+class PaymentError(ValueError):
+    pass
+
+
+# FIFO: to'lovlar eng eski qarzlarni yopadi; birinchi yopilmagan qarz sanasi
+_OLDEST_UNPAID_SQL = """
+    UPDATE customer_balances b
+    SET oldest_unpaid_at = (
+        SELECT x.created_at
+        FROM (
+            SELECT d.id, d.created_at,
+                   SUM(d.amount) OVER (ORDER BY d.created_at, d.id) AS running
+            FROM debts d
+            WHERE d.customer_id = b.customer_id
+        ) x
+        WHERE x.running > b.paid_total
+        ORDER BY x.created_at, x.id
+        LIMIT 1
+    )
+"""
+
+
+def record_debt(cur, customer_id, amount, created_at):
+    """Checkout ichida: qarzga sotuvni mijoz qoldig'iga qo'shadi."""
+    if customer_id is None or not amount:
+        return
+    cur.execute(
+        """
+        INSERT INTO customer_balances AS b (customer_id, debt_total, oldest_unpaid_at, last_debt_at)
+        VALUES (%(cid)s, %(amount)s, %(at)s, %(at)s)
+        ON CONFLICT (customer_id) DO UPDATE
+        SET debt_total = b.debt_total + EXCLUDED.debt_total,
+            oldest_unpaid_at = CASE WHEN b.balance > 0 THEN b.oldest_unpaid_at ELSE EXCLUDED.oldest_unpaid_at END,
+            last_debt_at = EXCLUDED.last_debt_at,
+            updated_at = now();
+        """,
+        {"cid": customer_id, "amount": amount, "at": created_at},
+    )
+
+
+def record_payment(conn, customer_id, amount, note=None, created_by=None):
+    """
+    To'lovni yozadi (commit chaqiruvchida). Qaytaradi: yangi qoldiq.
+    Qoldiq qatori FOR UPDATE bilan qulflanadi — bir vaqtdagi ikki to'lov
+    qoldiqdan oshib keta olmaydi.
+    """
+    amount = int(amount)
+    if amount <= 0:
+        raise PaymentError("To'lov summasi musbat bo'lishi kerak.")
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT balance FROM customer_balances WHERE customer_id = %s FOR UPDATE;", (customer_id,))
+        row = cur.fetchone()
+        balance = row[0] if row else 0
+        if amount > balance:
+            raise PaymentError(f"To'lov qoldiqdan katta: qoldiq {balance:,} so'm.".replace(",", " "))
+        cur.execute(
+            """
+            INSERT INTO debt_payments (customer_id, amount, note, created_by)
+            VALUES (%s, %s, %s, %s)
+            RETURNING created_at;
+            """,
+            (customer_id, amount, note or None, created_by),
+        )
+        paid_at = cur.fetchone()[0]
+        cur.execute(
+            """
+            UPDATE customer_balances
+            SET paid_total = paid_total + %s, last_payment_at = %s, updated_at = now()
+            WHERE customer_id = %s;
+            """,
+            (amount, paid_at, customer_id),
+        )
+        cur.execute(_OLDEST_UNPAID_SQL + " WHERE b.customer_id = %s;", (customer_id,))
+        metrics.incr("debt_ledger.payments")
+        return balance - amount
+    finally:
+        cur.close()
+
+
+def get_balance(customer_id):
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        """
+        SELECT c.id AS customer_id, c.name, c.phone,
+               COALESCE(b.debt_total, 0) AS debt_total,
+               COALESCE(b.paid_total, 0) AS paid_total,
+               COALESCE(b.balance, 0) AS balance,
+               b.oldest_unpaid_at, b.last_debt_at, b.last_payment_at
+        FROM customers c
+        LEFT JOIN customer_balances b ON b.customer_id = c.id
+        WHERE c.id = %s;
+        """,
+        (customer_id,),
+    )
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return row
+
+
+def customer_ledger(customer_id, limit=200):
+    """Mijozning qarz va to'lov yozuvlari (yangilari birinchi)."""
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        """
+        SELECT 'debt' AS kind, d.id, d.sale_id, d.amount, d.created_at, NULL AS note, NULL AS created_by
+        FROM debts d WHERE d.customer_id = %(cid)s
+        UNION ALL
+        SELECT 'payment', p.id, NULL, p.amount, p.created_at, p.note, p.created_by
+        FROM debt_payments p WHERE p.customer_id = %(cid)s
+        ORDER BY created_at DESC, id DESC
+        LIMIT %(limit)s;
+        """,
+        {"cid": customer_id, "limit": limit},
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def summary(overdue_days=None):
+    """Jami qoldiq, qarzdorlar va muddati o'tganlar soni (customer_balances bo'yicha)."""
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        """
+        SELECT COUNT(*) AS debtors,
+               COALESCE(SUM(balance), 0) AS outstanding,
+               COUNT(*) FILTER (WHERE oldest_unpaid_at < LOCALTIMESTAMP - make_interval(days => %s)) AS overdue
+        FROM customer_balances
+        WHERE balance > 0;
+        """,
+        (OVERDUE_DAYS if overdue_days is None else overdue_days,),
+    )
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return row
+
+
+def rebuild(conn):
+    """customer_balances'ni debts va debt_payments'dan qayta hisoblaydi. Qaytaradi: mijozlar soni."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM customer_balances;")
+    cur.execute(
+        """
+        INSERT INTO customer_balances (customer_id, debt_total, paid_total, last_debt_at, last_payment_at)
+        SELECT c.id, COALESCE(d.total, 0), COALESCE(p.total, 0), d.last_at, p.last_at
+        FROM customers c
+        LEFT JOIN (
+            SELECT customer_id, SUM(amount) AS total, MAX(created_at) AS last_at
+            FROM debts GROUP BY customer_id
+        ) d ON d.customer_id = c.id
+        LEFT JOIN (
+            SELECT customer_id, SUM(amount) AS total, MAX(created_at) AS last_at
+            FROM debt_payments GROUP BY customer_id
+        ) p ON p.customer_id = c.id
+        WHERE d.customer_id IS NOT NULL OR p.customer_id IS NOT NULL;
+        """
+    )
+    count = cur.rowcount
+    cur.execute(_OLDEST_UNPAID_SQL + " WHERE b.balance > 0;")
+    cur.close()
+    return count
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Qarz daftari (customer_balances) boshqaruvi")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="debts va debt_payments'dan qayta hisoblash")
+    args = parser.parse_args()
+
+    if args.cmd == "rebuild":
+        conn = get_conn()
+        try:
+            count = rebuild(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"✅ customer_balances: {count} ta mijoz")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Telegram update'larini user_id bo'yicha shardlab worker'larga tarqatish.
+
+- Bitta foydalanuvchining update'lari doim bitta shard'ga tushadi —
+  ketma-ketlik saqlanadi (holat/savatcha poygasi yo'q); turli
+  foydalanuvchilar parallel ishlanadi (Excel yuklash boshqalarni to'xtatmaydi).
+- Har bir shard navbati cheklangan (BOT_SHARD_QUEUE); to'lsa polling oqimi
+  kutadi (tabiiy backpressure).
+- Metrics: bot.handler.<nom>_seconds (har bir handler), bot.update_seconds,
+  bot.queue_wait_seconds, gauge "bot_dispatch" (shard navbatlari chuqurligi).
+
+Sozlamalar: BOT_WORKERS (default 4; 0 — telebot'ning o'z worker pool'i).
+"""
+import functools
+import os
+import queue
+import threading
+import time
+import traceback
+
+import metrics
+
+HANDLER_LISTS = (
+    "message_handlers",
+    "edited_message_handlers",
+    "callback_query_handlers",
+    "inline_handlers",
+    "chosen_inline_handlers",
+)
+
+
+def update_user_id(update):
+    """Shard kaliti: update muallifi (bo'lmasa chat yoki update_id)."""
+    for attr in ("message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+                 "my_chat_member", "chat_member"):
+        obj = getattr(update, attr, None)
+        if obj is None:
+            continue
+        user = getattr(obj, "from_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(obj, "chat", None)
+        if chat is not None:
+            return chat.id
+    return update.update_id
+
+
+def _timed_handler(fn):
+    if getattr(fn, "_dispatch_timed", False):
+        return fn
+    hist = metrics.histogram(f"bot.handler.{fn.__name__}_seconds")
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            hist.observe(time.perf_counter() - start)
+
+    wrapper._dispatch_timed = True
+    return wrapper
+
+
+class ShardedDispatcher:
+    def __init__(self, bot, workers=4, queue_size=100):
+        self.bot = bot
+        self.workers = workers
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._process = None
+
+    def _instrument_handlers(self):
+        for attr in HANDLER_LISTS:
+            for handler in getattr(self.bot, attr, []):
+                handler["function"] = _timed_handler(handler["function"])
+
+    def _worker(self, q):
+        while True:
+            update, queued_at = q.get()
+            metrics.histogram("bot.queue_wait_seconds").observe(time.monotonic() - queued_at)
+            try:
+                with metrics.timed("bot.update_seconds"):
+                    self._process([update])
+            except Exception:
+                metrics.incr("bot.handler_errors")
+                traceback.print_exc()
+            finally:
+                q.task_done()
+
+    def process_new_updates(self, updates):
+        """Polling oqimida chaqiriladi (telebot'ning process_new_updates o'rniga)."""
+        if not updates:
+            return
+        # offset worker'lardan oldin suriladi: ular last_update_id ni hech qachon ortga qaytarmaydi
+        newest = max(u.update_id for u in updates)
+        if newest > self.bot.last_update_id:
+            self.bot.last_update_id = newest
+        for update in updates:
+            shard = hash(update_user_id(update)) % self.workers
+            self._queues[shard].put((update, time.monotonic()))
+
+    def install(self):
+        """Barcha handler'lar ro'yxatdan o'tgandan keyin (polling'dan oldin) chaqiring."""
+        self._instrument_handlers()
+        if self.workers <= 0:
+            return self
+        self._process = self.bot.process_new_updates
+        # handler'lar worker oqimida to'g'ridan-to'g'ri bajarilsin
+        self.bot.threaded = False
+        self.bot.process_new_updates = self.process_new_updates
+        for i, q in enumerate(self._queues):
+            t = threading.Thread(target=self._worker, args=(q,), name=f"bot-shard-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        metrics.register_gauge("bot_dispatch", self.stats)
+        return self
+
+    def stats(self):
+        depths = [q.qsize() for q in self._queues]
+        return {"workers": len(self._threads), "depths": depths, "queued": sum(depths)}
+
+
+def install(bot):
+    return ShardedDispatcher(
+        bot,
+        workers=int(os.getenv("BOT_WORKERS", "4")),
+        queue_size=int(os.getenv("BOT_SHARD_QUEUE", "100")),
+    ).install()
@@ -0,0 +1,118 @@
+"""
+Excel eksportlar (ombor, qarzdorlar) — bot va web uchun umumiy.
+
+Qatorlar server-side kursordan bo'laklab o'qiladi, jami qiymatlar yozish
+jarayonida hisoblanadi va openpyxl write-only rejimida yoziladi — xotira
+mahsulotlar soniga bog'liq emas (100k+ SKU). Natija SpooledTemporaryFile:
+kichik fayl xotirada, kattasi avtomatik diskka o'tadi.
+DATABASE_REPLICA_URL berilsa qatorlar replikadan o'qiladi (iter_rows(replica=True));
+openpyxl birinchi eksportda import qilinadi (web/bot ishga tushishini sekinlatmaydi).
+"""
+import tempfile
+from datetime import datetime
+
+import metrics
+from db import iter_rows
+
+CHUNK_ROWS = 2000
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+STOCK_SQL = """
+    SELECT id, name, qty, cost_price_usd, cost_price, stock_value_usd, stock_value, suggest_price, created_at
+    FROM products ORDER BY id
+"""
+STOCK_COLUMNS = [
+    "№", "Mahsulot nomi", "Miqdor (dona)", "Narx (USD)", "Narx (so‘m)",
+    "Qiymat (USD)", "Qiymat (so‘m)", "Taklif narxi (so‘m)", "Qo‘shilgan sana",
+]
+# jami qatori: ustun indekslari (0 dan). Narxlar yig'ilmaydi — qiymat = qty x narx
+# (products.stock_value*; jami stock_valuation.summary() bilan bir xil)
+STOCK_TOTALS = (2, 5, 6)
+
+DEBTS_SQL = """
+    SELECT c.name, c.phone, b.debt_total, b.paid_total, b.balance, b.oldest_unpaid_at
+    FROM customer_balances b
+    JOIN customers c ON c.id = b.customer_id
+    WHERE b.balance > 0
+    ORDER BY b.balance DESC, b.customer_id DESC
+"""
+DEBTS_COLUMNS = ["Mijoz", "Telefon", "Jami_qarz", "To‘langan", "Qoldiq", "Eng_eski_qarz"]
+DEBTS_TOTALS = (2, 3, 4)
+
+_STYLES = {}
+
+
+def _total_styles():
+    if not _STYLES:
+        from openpyxl.styles import Font, PatternFill
+
+        _STYLES["font"] = Font(bold=True)
+        _STYLES["fill"] = PatternFill(start_color="FFFACD", end_color="FFFACD", fill_type="solid")
+    return _STYLES["font"], _STYLES["fill"]
+
+
+def write_xlsx(fileobj, sheet_name, columns, rows, totals=()):
+    """
+    rows — tuple'lar iteratori. totals — yig'iladigan ustunlar; "Jami:"
+    birinchi jami ustunidan oldingi ustunga yoziladi. Qaytaradi: qatorlar soni.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+
+    sums = {i: 0 for i in totals}
+    count = 0
+    for row in rows:
+        ws.append(row)
+        for i in sums:
+            sums[i] += row[i] or 0
+        count += 1
+
+    if totals and count:
+        ws.append([])
+        label_col = min(totals) - 1
+        last = [None] * (max(totals) + 1)
+        last[label_col] = "Jami:"
+        for i, v in sums.items():
+            last[i] = v
+        bold, yellow = _total_styles()
+        styled = []
+        for i, v in enumerate(last):
+            cell = WriteOnlyCell(ws, value=v)
+            if i >= label_col:
+                cell.font = bold
+                cell.fill = yellow
+            styled.append(cell)
+        ws.append(styled)
+
+    wb.save(fileobj)
+    return count
+
+
+def _export(name, sql, sheet_name, columns, totals):
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, suffix=".xlsx")
+    with metrics.timed(f"export.{name}_seconds"):
+        count = write_xlsx(out, sheet_name, columns, iter_rows(f"export_{name}", sql, itersize=CHUNK_ROWS, replica=True), totals)
+    out.seek(0)
+    metrics.incr(f"export.{name}_rows", count)
+    return out, count
+
+
+def export_stock():
+    """Qaytaradi: (fayl obyekti, qatorlar soni). Fayl chaqiruvchi tomonidan yopiladi."""
+    return _export("stock", STOCK_SQL, "Ombor", STOCK_COLUMNS, STOCK_TOTALS)
+
+
+def export_debts():
+    return _export("debts", DEBTS_SQL, "Qarzdorlar", DEBTS_COLUMNS, DEBTS_TOTALS)
+
+
+def stock_filename():
+    return f"ombor_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
+
+
+def debts_filename():
+    return f"qarzdorlar_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
@@ -0,0 +1,135 @@
+"""
+Web ro'yxatlari uchun keyset sahifalash va oqimli (streaming) o'qish.
+
+- products: id bo'yicha (`WHERE id > after ORDER BY id`), kursor — oxirgi id.
+- debtors (customer_balances): (balance, customer_id) DESC, kursor —
+  "<qoldiq>|<customer_id>"; muddati o'tganlar — (oldest_unpaid_at,
+  customer_id), kursor — "<iso vaqt>|<customer_id>". Kursor ustunlari NULL
+  emas: balance — NOT NULL ustunlardan generated, oldest_unpaid_at NULL'lar
+  so'rovning o'zida chiqarib tashlanadi.
+- count_products: stock_valuation_slots'dan (products bo'yicha count(*) yo'q).
+- iter_*: server-side (named) kursor — qatorlar so'rov tugashini kutmasdan,
+  ITERSIZE bo'laklarda keladi (stream_template uchun).
+"""
+from datetime import datetime
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_conn, iter_rows
+
+PAGE_SIZE = 50
+ITERSIZE = 500
+
+_PRODUCTS_SQL = """
+    SELECT * FROM products
+    WHERE id > %(after)s AND (NOT %(in_stock)s OR qty > 0)
+    ORDER BY id
+"""
+
+_DEBTORS_COLUMNS = """
+    SELECT b.customer_id, c.name, c.phone, b.debt_total, b.paid_total, b.balance,
+           b.oldest_unpaid_at, b.last_debt_at, b.last_payment_at
+    FROM customer_balances b
+    JOIN customers c ON c.id = b.customer_id
+    WHERE b.balance > 0
+"""
+
+# top qarzdorlar: idx_customer_balances_top
+_DEBTORS_SQL = _DEBTORS_COLUMNS + """
+      AND (%(after_balance)s::bigint IS NULL OR (b.balance, b.customer_id) < (%(after_balance)s, %(after_id)s))
+    ORDER BY b.balance DESC, b.customer_id DESC
+"""
+
+# muddati o'tganlar (eng eskisi birinchi): idx_customer_balances_overdue.
+# oldest_unpaid_at NULL bo'lishi mumkin (sanasiz qarz) — bunday qatorlar kursor
+# kalitiga kirmaydi, shuning uchun ro'yxatdan aniq chiqariladi
+_OVERDUE_SQL = _DEBTORS_COLUMNS + """
+      AND b.oldest_unpaid_at IS NOT NULL
+      AND b.oldest_unpaid_at < LOCALTIMESTAMP - make_interval(days => %(days)s)
+      AND (%(after_ts)s::timestamp IS NULL OR (b.oldest_unpaid_at, b.customer_id) > (%(after_ts)s, %(after_id)s))
+    ORDER BY b.oldest_unpaid_at, b.customer_id
+"""
+
+
+def _fetch_page(sql, params, limit):
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(sql + " LIMIT %(limit)s;", dict(params, limit=limit + 1))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows[:limit], len(rows) > limit
+
+
+# --- products ---
+def _product_params(after, in_stock):
+    # buzuq ?after= — birinchi sahifa (500 emas)
+    try:
+        after_id = int(after or 0)
+    except (TypeError, ValueError):
+        after_id = 0
+    return {"after": after_id, "in_stock": bool(in_stock)}
+
+
+def products_page(after=None, in_stock=False, limit=PAGE_SIZE):
+    """Qaytaradi: (rows, next_cursor) — next_cursor None bo'lsa oxirgi sahifa."""
+    rows, has_more = _fetch_page(_PRODUCTS_SQL, _product_params(after, in_stock), limit)
+    return rows, (str(rows[-1]["id"]) if has_more else None)
+
+
+def iter_products(in_stock=False):
+    return iter_rows("products_stream", _PRODUCTS_SQL, _product_params(None, in_stock), ITERSIZE, RealDictCursor)
+
+
+def count_products(in_stock=False):
+    """Trigger bilan yuritiladigan stock_valuation_slots'dan (16 qator) — count(*) skan qilinmaydi."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COALESCE(SUM(CASE WHEN %s THEN in_stock ELSE products END), 0) FROM stock_valuation_slots;",
+        (bool(in_stock),),
+    )
+    total = int(cur.fetchone()[0])
+    cur.close()
+    conn.close()
+    return total
+
+
+# --- debtors (customer_balances) ---
+def _split_cursor(cursor, parse):
+    if cursor:
+        try:
+            head, _, cid = cursor.rpartition("|")
+            return parse(head), int(cid)
+        except ValueError:
+            pass
+    return None, 0
+
+
+def _debtor_params(cursor, overdue_days):
+    if overdue_days is None:
+        after_balance, after_id = _split_cursor(cursor, int)
+        return _DEBTORS_SQL, {"after_balance": after_balance, "after_id": after_id}
+    after_ts, after_id = _split_cursor(cursor, datetime.fromisoformat)
+    return _OVERDUE_SQL, {"days": int(overdue_days), "after_ts": after_ts, "after_id": after_id}
+
+
+def _debtor_cursor(row, overdue_days):
+    if overdue_days is None:
+        return f"{row['balance']}|{row['customer_id']}"
+    return f"{row['oldest_unpaid_at'].isoformat()}|{row['customer_id']}"
+
+
+def debtors_page(cursor=None, overdue_days=None, limit=PAGE_SIZE):
+    """
+    Qoldig'i bor mijozlar: qoldiq bo'yicha kamayish tartibida yoki
+    overdue_days berilsa — shuncha kundan eski to'lanmagan qarzi borlar.
+    """
+    sql, params = _debtor_params(cursor, overdue_days)
+    rows, has_more = _fetch_page(sql, params, limit)
+    return rows, (_debtor_cursor(rows[-1], overdue_days) if has_more else None)
+
+
+def iter_debtors(overdue_days=None):
+    sql, params = _debtor_params(None, overdue_days)
+    return iter_rows("debtors_stream", sql, params, ITERSIZE, RealDictCursor)
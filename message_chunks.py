@@ -0,0 +1,68 @@
+"""
+Uzun bot javoblarini Telegram chegarasiga (4096 belgi) sig'adigan bo'laklarga bo'lish.
+
+- Bo'lish satr chegaralarida (avval bo'sh satr, keyin oddiy satr);
+  botdagi HTML teglar (<b>...</b>) bitta satr ichida yopiladi, shuning
+  uchun bo'laklar parse_mode="HTML" bilan ham to'g'ri qoladi.
+- Chegaradan uzun bitta satr qattiq kesiladi.
+- Uzunlik UTF-16 birliklarida o'lchanadi (Telegram shunday sanaydi;
+  emoji 2 birlik).
+"""
+MAX_MESSAGE_LEN = 4096
+
+
+def tg_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_split(line, limit):
+    parts = [""]
+    for ch in line:
+        if tg_len(parts[-1]) + tg_len(ch) > limit:
+            parts.append("")
+        parts[-1] += ch
+    return parts
+
+
+def _pieces(text, limit):
+    """(bo'lak, oldingi ajratuvchi) juftlari: bloklar, sig'masa — satrlar, sig'masa — kesiklar."""
+    for i, block in enumerate(text.split("\n\n")):
+        block_sep = "\n\n" if i else ""
+        if tg_len(block) <= limit:
+            yield block, block_sep
+            continue
+        for j, line in enumerate(block.split("\n")):
+            line_sep = "\n" if j else block_sep
+            if tg_len(line) <= limit:
+                yield line, line_sep
+                continue
+            for k, part in enumerate(_hard_split(line, limit)):
+                yield part, ("" if k else line_sep)
+
+
+def split_message(text, limit=MAX_MESSAGE_LEN):
+    """Qaytaradi: bo'laklar ro'yxati (har biri <= limit)."""
+    if tg_len(text) <= limit:
+        return [text]
+    chunks = []
+    current = ""
+    for piece, sep in _pieces(text, limit):
+        if current and tg_len(current) + tg_len(sep) + tg_len(piece) <= limit:
+            current += sep + piece
+        else:
+            if current.strip():
+                chunks.append(current)
+            current = piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def send_long_message(bot, chat_id, text, reply_markup=None, **kwargs):
+    """Bo'laklab yuboradi; reply_markup faqat oxirgi bo'lakka. Qaytaradi: oxirgi Message."""
+    message = None
+    chunks = split_message(text)
+    for i, chunk in enumerate(chunks):
+        markup = reply_markup if i == len(chunks) - 1 else None
+        message = bot.send_message(chat_id, chunk, reply_markup=markup, **kwargs)
+    return message
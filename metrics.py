@@ -0,0 +1,107 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds (last bucket catches everything above).
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LOCK = threading.Lock()
+_HISTOGRAMS = {}
+_COUNTERS = {}
+_GAUGES = {}
+
+
+class Histogram:
+    """Small thread-safe latency histogram (count/sum/min/max + fixed buckets)."""
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+
+    def _quantile(self, q):
+        target = self.count * q
+        seen = 0
+        for i, c in enumerate(self._counts):
+            seen += c
+            if seen >= target and c:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            if not self.count:
+                return {"count": 0}
+            return {
+                "count": self.count,
+                "sum": round(self.total, 6),
+                "avg": round(self.total / self.count, 6),
+                "min": round(self.min, 6),
+                "max": round(self.max, 6),
+                "p50": self._quantile(0.5),
+                "p95": self._quantile(0.95),
+            }
+
+
+def histogram(name):
+    with _LOCK:
+        h = _HISTOGRAMS.get(name)
+        if h is None:
+            h = _HISTOGRAMS[name] = Histogram(name)
+        return h
+
+
+def incr(name, value=1):
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def register_gauge(name, fn):
+    """fn() is called lazily on every snapshot()."""
+    with _LOCK:
+        _GAUGES[name] = fn
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(name).observe(time.perf_counter() - start)
+
+
+def snapshot():
+    with _LOCK:
+        hists = dict(_HISTOGRAMS)
+        counters = dict(_COUNTERS)
+        gauges = dict(_GAUGES)
+    data = {
+        "counters": counters,
+        "histograms": {name: h.snapshot() for name, h in hists.items()},
+        "gauges": {},
+    }
+    for name, fn in gauges.items():
+        try:
+            data["gauges"][name] = fn()
+        except Exception as e:
+            data["gauges"][name] = f"error: {e}"
+    return data
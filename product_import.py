@@ -0,0 +1,193 @@
+"""
+Excel'dan mahsulotlarni ommaviy yuklash (bot.py va web_app.py uchun umumiy).
+
+Qatorlar pandas bilan vektorli tozalanadi, COPY orqali vaqtinchalik jadvalga
+yoziladi va `products` ga bitta set-based upsert bilan qo'shiladi:
+kalit — (lower(name), cost_price_usd). Mavjud bo'lsa qty qo'shiladi,
+bo'lmasa yangi mahsulot yaratiladi. Ixtiyoriy "min qoldiq" ustuni
+products.reorder_level'ni o'rnatadi (bo'sh katak — o'zgarmaydi / default).
+"""
+import io
+
+import stock_alerts
+from core.lazy import lazy_import
+
+# pandas birinchi yuklashda import qilinadi
+pd = lazy_import("pandas")
+
+NAME_KEYS = ["name", "nom", "product", "product_name", "mahsulot", "mahsol", "mahsulot nomi"]
+QTY_KEYS = ["qty", "quantity", "soni", "miqdor", "son"]
+COST_USD_KEYS = ["cost_price_usd", "cost_usd", "opt_narx_usd", "usd narx"]
+SUGGEST_KEYS = ["suggest_price", "sell_price", "price", "sotuv_narx", "taklif narxi"]
+REORDER_KEYS = ["reorder_level", "min_qty", "min_qoldiq", "min qoldiq", "chegara"]
+
+
+class ImportColumnsError(ValueError):
+    pass
+
+
+def read_excel(fileobj):
+    try:
+        return pd.read_excel(fileobj, engine="openpyxl")
+    except Exception:
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        return pd.read_excel(fileobj)
+
+
+def _find_col(columns, keys):
+    for key in keys:
+        if key in columns:
+            return key
+    return None
+
+
+def _to_number(series, decimal_comma):
+    text = series.astype(str).str.strip()
+    text = text.str.replace(",", "." if decimal_comma else "", regex=False)
+    values = pd.to_numeric(text, errors="coerce")
+    bad = values.isna() & series.notna()
+    return values.where(series.notna(), 0), bad
+
+
+def prepare_rows(df):
+    """
+    DataFrame -> (rows, skipped, errors).
+    rows: row_no, name, qty, cost_usd, suggest, reorder ustunlari bilan tozalangan
+    DataFrame (reorder bo'sh bo'lishi mumkin).
+    row_no — Excel'dagi qator raqami (sarlavha 1-qator).
+    """
+    df = df.copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    col_name = _find_col(df.columns, NAME_KEYS)
+    col_qty = _find_col(df.columns, QTY_KEYS)
+    col_cost_usd = _find_col(df.columns, COST_USD_KEYS)
+    col_suggest = _find_col(df.columns, SUGGEST_KEYS)
+    col_reorder = _find_col(df.columns, REORDER_KEYS)
+    if not col_name or not col_qty or not col_cost_usd:
+        raise ImportColumnsError("Excel faylda nom, miqdor yoki USD narx ustunlari topilmadi.")
+
+    row_no = pd.Series(range(2, len(df) + 2), index=df.index)
+    names = df[col_name].where(df[col_name].notna(), "").astype(str).str.strip()
+    qty, bad_qty = _to_number(df[col_qty], decimal_comma=False)
+    cost_usd, bad_cost = _to_number(df[col_cost_usd], decimal_comma=True)
+    if col_suggest:
+        suggest, bad_suggest = _to_number(df[col_suggest], decimal_comma=False)
+    else:
+        suggest = pd.Series(0, index=df.index)
+        bad_suggest = pd.Series(False, index=df.index)
+    if col_reorder:
+        reorder, bad_reorder = _to_number(df[col_reorder], decimal_comma=False)
+        reorder = reorder.where(df[col_reorder].notna())
+        bad_reorder = bad_reorder | (reorder < 0)
+    else:
+        reorder = pd.Series(float("nan"), index=df.index)
+        bad_reorder = pd.Series(False, index=df.index)
+
+    errors = []
+    bad = bad_qty | bad_cost | bad_suggest | bad_reorder
+    checks = (("miqdor", bad_qty), ("USD narx", bad_cost), ("sotuv narx", bad_suggest), ("min qoldiq", bad_reorder))
+    for idx in df.index[bad]:
+        fields = [label for label, mask in checks if mask[idx]]
+        errors.append(f"Qator {row_no[idx]}: noto'g'ri {', '.join(fields)}")
+
+    qty = qty.fillna(0).astype(float).astype(int)
+    valid = ~bad
+    skip = valid & ((names == "") | (qty <= 0))
+
+    keep = valid & ~skip
+    rows = pd.DataFrame({
+        "row_no": row_no[keep],
+        "name": names[keep],
+        "qty": qty[keep],
+        "cost_usd": cost_usd[keep].astype(float).round(2),
+        "suggest": suggest[keep].fillna(0).astype(float).astype(int),
+        "reorder": reorder[keep].astype(float).round().astype("Int64"),
+    })
+    return rows, int(skip.sum()), errors
+
+
+_MERGE_SQL = """
+    WITH staged AS (
+        SELECT lower(name) AS key,
+               cost_usd,
+               (array_agg(name ORDER BY row_no))[1] AS name,
+               SUM(qty) AS qty,
+               COUNT(*) AS n,
+               (array_agg(suggest ORDER BY row_no DESC) FILTER (WHERE suggest > 0))[1] AS suggest,
+               (array_agg(reorder ORDER BY row_no DESC) FILTER (WHERE reorder IS NOT NULL))[1] AS reorder
+        FROM tmp_product_import
+        GROUP BY lower(name), cost_usd
+    ),
+    matched AS (
+        SELECT s.*,
+               (SELECT p.id FROM products p
+                WHERE lower(p.name) = s.key AND p.cost_price_usd = s.cost_usd
+                ORDER BY p.id LIMIT 1) AS product_id
+        FROM staged s
+    ),
+    upd AS (
+        UPDATE products p
+        SET qty = p.qty + m.qty,
+            cost_price = trunc(m.cost_usd * %(rate)s)::bigint,
+            usd_rate = %(rate)s,
+            suggest_price = COALESCE(m.suggest, p.suggest_price),
+            reorder_level = COALESCE(m.reorder, p.reorder_level)
+        FROM matched m
+        WHERE p.id = m.product_id
+        RETURNING p.id
+    ),
+    ins AS (
+        INSERT INTO products (name, qty, cost_price, cost_price_usd, usd_rate, suggest_price, reorder_level)
+        SELECT m.name, m.qty, trunc(m.cost_usd * %(rate)s)::bigint, m.cost_usd, %(rate)s, COALESCE(m.suggest, 0),
+               COALESCE(m.reorder, %(reorder_default)s)
+        FROM matched m
+        WHERE m.product_id IS NULL
+        RETURNING id
+    )
+    SELECT (SELECT COUNT(*) FROM ins) AS inserted,
+           (SELECT COALESCE(SUM(n), 0) FROM matched) - (SELECT COUNT(*) FROM ins) AS updated;
+"""
+
+
+def import_products(conn, df, usd_rate):
+    """
+    Excel DataFrame'ni bazaga yozadi (commit chaqiruvchida).
+    Qaytaradi: {"inserted", "updated", "skipped", "errors"}.
+    Bir fayldagi bir xil (nom, USD narx) qatorlari bitta mahsulotga
+    qo'shiladi: birinchisi "yangi", qolganlari "yangilangan" hisoblanadi.
+    """
+    rows, skipped, errors = prepare_rows(df)
+    result = {"inserted": 0, "updated": 0, "skipped": skipped, "errors": errors}
+    if rows.empty:
+        return result
+
+    buf = io.StringIO()
+    rows.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS tmp_product_import (
+                row_no INTEGER,
+                name TEXT,
+                qty INTEGER,
+                cost_usd NUMERIC(12,2),
+                suggest BIGINT,
+                reorder INTEGER
+            ) ON COMMIT DROP;
+        """)
+        cur.copy_expert(
+            "COPY tmp_product_import (row_no, name, qty, cost_usd, suggest, reorder) FROM STDIN WITH (FORMAT csv);",
+            buf,
+        )
+        cur.execute(_MERGE_SQL, {"rate": float(usd_rate), "reorder_default": stock_alerts.DEFAULT_REORDER_LEVEL})
+        inserted, updated = cur.fetchone()
+        cur.execute("DROP TABLE IF EXISTS tmp_product_import;")
+    finally:
+        cur.close()
+
+    result["inserted"] = int(inserted)
+    result["updated"] = int(updated)
+    return result
@@ -0,0 +1,251 @@
+"""
+Mahsulot qidiruvi (bot: sell_search, web: /products, /sales/new).
+
+- Postgres: pg_trgm GIN indeks `product_search_key(name)` ustida (db_init.sql).
+  Moslik: prefiks/qism (LIKE) yoki trigram word_similarity (xatoli yozuv).
+- Tartib: prefiks > qism > o'xshashlik, + so'nggi 30 kun sotuv tezligi
+  (sales_daily_rollup).
+- pg_trgm o'rnatilmagan bo'lsa — jarayon ichidagi LocalTrigramIndex
+  (xuddi shu normalizatsiya va baholash), mahsulotlardan qurilib qisqa
+  muddat keshlanadi; mahsulot qo'shish/import invalidate_local_index() ni
+  chaqiradi (boshqa jarayonda LOCAL_INDEX_TTL ichida yangilanadi).
+- Sahifalash: search(..., limit, offset) -> (rows, has_more).
+
+Normalizatsiya: kichik harf, o‘/o'/o`/oʻ kabi apostrof variantlari olib
+tashlanadi, bo'shliqlar siqiladi ("og'il" == "o‘g‘il" == "ogil").
+"""
+import math
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+from psycopg2.extras import RealDictCursor
+
+import metrics
+from core.periods import local_today
+from db import get_conn
+
+PAGE_SIZE = 10
+VELOCITY_DAYS = 30
+VELOCITY_WEIGHT = 0.1
+# word_similarity chegarasi (pg_trgm default 0.6 — transliteratsiya xatolari uchun qattiq)
+SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY", "0.4"))
+LOCAL_INDEX_TTL = 60
+
+# db_init.sql dagi product_search_key() bilan bir xil bo'lishi kerak
+APOSTROPHES = "'`‘’ʻʼ"
+_APOS_TABLE = str.maketrans("", "", APOSTROPHES)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    return _SPACES.sub(" ", (text or "").lower().translate(_APOS_TABLE)).strip()
+
+
+def _like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _velocity_since():
+    # rollup'dagi day — TIMEZONE bo'yicha mahalliy kun (server current_date emas)
+    return local_today() - timedelta(days=VELOCITY_DAYS)
+
+
+# --- pg_trgm ---
+_SEARCH_SQL = """
+    SELECT p.*,
+           (CASE WHEN k.key LIKE %(prefix)s THEN 1.0
+                 WHEN k.key LIKE %(contains)s THEN 0.5
+                 ELSE 0 END
+            + word_similarity(%(q)s, k.key)
+            + %(vw)s * ln(1 + COALESCE(v.sold, 0))) AS score
+    FROM products p
+    CROSS JOIN LATERAL (SELECT product_search_key(p.name) AS key) k
+    LEFT JOIN (
+        SELECT product_id, SUM(qty) AS sold
+        FROM sales_daily_rollup
+        WHERE day >= %(since)s
+        GROUP BY product_id
+    ) v ON v.product_id = p.id
+    WHERE (product_search_key(p.name) LIKE %(contains)s OR %(q)s <%% product_search_key(p.name))
+      AND (NOT %(in_stock)s OR p.qty > 0)
+    ORDER BY score DESC, p.id
+    LIMIT %(limit)s OFFSET %(offset)s;
+"""
+
+_trgm_available = None
+
+
+def _has_trgm(cur):
+    global _trgm_available
+    if _trgm_available is None:
+        cur.execute(
+            """
+            SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+               AND EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'product_search_key') AS ok;
+            """
+        )
+        _trgm_available = bool(cur.fetchone()["ok"])
+        if not _trgm_available:
+            print("⚠️ pg_trgm topilmadi — mahsulot qidiruvi jarayon ichidagi indeksda ishlaydi")
+    return _trgm_available
+
+
+def _search_trgm(cur, q, in_stock, limit, offset):
+    like = _like_escape(q)
+    cur.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true);", (str(SIMILARITY_THRESHOLD),))
+    cur.execute(
+        _SEARCH_SQL,
+        {
+            "q": q,
+            "prefix": like + "%",
+            "contains": "%" + like + "%",
+            "vw": VELOCITY_WEIGHT,
+            "since": _velocity_since(),
+            "in_stock": in_stock,
+            "limit": limit + 1,
+            "offset": offset,
+        },
+    )
+    return cur.fetchall()
+
+
+# --- in-process fallback ---
+def trigrams(text):
+    """pg_trgm uslubidagi trigramlar: har bir so'z '  so'z ' ko'rinishida."""
+    out = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            out.add(padded[i:i + 3])
+    return out
+
+
+def word_similarity(query, text):
+    """
+    pg_trgm word_similarity taxmini: so'rov trigramlarining matndagi eng
+    yaxshi mos so'z(lar) bilan ulushi.
+    """
+    q = trigrams(query)
+    if not q:
+        return 0.0
+    best = 0.0
+    words = normalize(text).split()
+    for i in range(len(words)):
+        for j in range(i + 1, len(words) + 1):
+            t = trigrams(" ".join(words[i:j]))
+            best = max(best, len(q & t) / len(q | t))
+    return best
+
+
+class LocalTrigramIndex:
+    """Trigram -> mahsulot id to'plami. search() pg_trgm so'rovi bilan bir xil baholaydi."""
+
+    def __init__(self, rows=(), velocity=None):
+        self._rows = {}
+        self._keys = {}
+        self._grams = {}
+        self._velocity = velocity or {}
+        for r in rows:
+            self.add(r)
+
+    def add(self, row):
+        pid = row["id"]
+        key = normalize(row["name"])
+        self._rows[pid] = row
+        self._keys[pid] = key
+        for g in trigrams(key):
+            self._grams.setdefault(g, set()).add(pid)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _score(self, pid, q):
+        key = self._keys[pid]
+        if key.startswith(q):
+            bonus = 1.0
+        elif q in key:
+            bonus = 0.5
+        else:
+            bonus = 0.0
+        sim = word_similarity(q, key)
+        if not bonus and sim < SIMILARITY_THRESHOLD:
+            return None
+        return bonus + sim + VELOCITY_WEIGHT * math.log(1 + self._velocity.get(pid, 0))
+
+    def search(self, text, in_stock=False, limit=PAGE_SIZE, offset=0):
+        q = normalize(text)
+        if not q:
+            return [], False
+        candidates = set()
+        for g in trigrams(q):
+            candidates |= self._grams.get(g, set())
+        # 1-2 harfli so'rovlarda trigram yo'q — qism bo'yicha tekshiramiz
+        candidates |= {pid for pid, key in self._keys.items() if q in key}
+
+        scored = []
+        for pid in candidates:
+            row = self._rows[pid]
+            if in_stock and (row.get("qty") or 0) <= 0:
+                continue
+            score = self._score(pid, q)
+            if score is not None:
+                scored.append((-score, pid))
+        scored.sort()
+        page = [dict(self._rows[pid], score=-s) for s, pid in scored[offset:offset + limit + 1]]
+        return page[:limit], len(page) > limit
+
+
+_local = {"index": None, "built": 0.0}
+_local_lock = threading.Lock()
+
+
+def _local_index(cur):
+    with _local_lock:
+        if _local["index"] is None or time.monotonic() - _local["built"] > LOCAL_INDEX_TTL:
+            cur.execute("SELECT * FROM products;")
+            rows = cur.fetchall()
+            cur.execute(
+                """
+                SELECT product_id, SUM(qty) AS sold
+                FROM sales_daily_rollup
+                WHERE day >= %s
+                GROUP BY product_id;
+                """,
+                (_velocity_since(),),
+            )
+            velocity = {r["product_id"]: int(r["sold"] or 0) for r in cur.fetchall()}
+            _local["index"] = LocalTrigramIndex(rows, velocity)
+            _local["built"] = time.monotonic()
+        return _local["index"]
+
+
+def invalidate_local_index():
+    """Mahsulot qo'shilgan/import qilingandan keyin (commit'dan so'ng) — shu jarayonda darhol."""
+    with _local_lock:
+        _local["index"] = None
+
+
+# --- public API ---
+def search(text, in_stock=False, limit=PAGE_SIZE, offset=0):
+    """
+    Mahsulotlarni qidiradi. Qaytaradi: (rows, has_more); rows — products
+    ustunlari + score, eng mosi birinchi.
+    """
+    q = normalize(text)
+    if not q:
+        return [], False
+    offset = max(0, int(offset or 0))
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        with metrics.timed("product_search.seconds"):
+            if _has_trgm(cur):
+                rows = _search_trgm(cur, q, in_stock, limit, offset)
+                return rows[:limit], len(rows) > limit
+            return _local_index(cur).search(q, in_stock=in_stock, limit=limit, offset=offset)
+    finally:
+        cur.close()
+        conn.close()
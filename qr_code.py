@@ -0,0 +1,89 @@
+"""
+Chek uchun QR kod (receipt_layout.draw_layout ishlatadi).
+
+- Payload'ga sig'adigan eng kichik versiya tanlanadi; shu versiyaga
+  sig'adigan eng yuqori xato tuzatish darajasi (H > Q > M > L) olinadi —
+  modul soni oshmaydi, o'qilishi esa yaxshilanadi.
+- Modul o'lchami butun son (box = size // (modullar + 2*QUIET)) — tasvir
+  to'g'ridan-to'g'ri shu o'lchamda chiziladi, resample (xiralashish) yo'q;
+  QR size x size oq kvadrat markaziga joylanadi. Qolgan quiet zone'ni
+  chekdagi oq maydon beradi.
+- Tayyor bitmap (payload, size) bo'yicha LRU keshda (QR_CACHE_SIZE,
+  default 512) — payload sale_id ni o'z ichiga oladi, ya'ni kesh sotuv
+  bo'yicha; chekni qayta chizish/yuklashda QR qayta yaratilmaydi.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+import metrics
+
+QUIET = 2  # modul; 4 modullik quiet zone'ning qolgani chek chetidagi oq joy
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_max_entries = int(os.getenv("QR_CACHE_SIZE", "512"))
+
+
+def qr_matrix(payload):
+    """Qaytaradi: (matrix, version, ec_level) — matrix: bool ro'yxatlari, chegarasiz."""
+    import qrcode
+    from qrcode import constants
+
+    levels = (
+        (constants.ERROR_CORRECT_L, "L"),
+        (constants.ERROR_CORRECT_M, "M"),
+        (constants.ERROR_CORRECT_Q, "Q"),
+        (constants.ERROR_CORRECT_H, "H"),
+    )
+    # best_fit faqat bit uzunligini hisoblaydi — arzon; to'liq make() (mask tanlash) bir marta
+    best = None
+    for level, name in levels:
+        qr = qrcode.QRCode(version=None, error_correction=level, box_size=1, border=0)
+        qr.add_data(payload)
+        version = qr.best_fit()
+        if best is not None and version > best[2]:
+            break
+        best = (qr, name, version)
+    qr, name, version = best
+    qr.make(fit=False)
+    return qr.get_matrix(), version, name
+
+
+def render_qr(payload, size):
+    """size x size, '1' rejimidagi oq fonli tasvir (QR markazda)."""
+    matrix, _, _ = qr_matrix(payload)
+    n = len(matrix)
+    box = max(1, size // (n + 2 * QUIET))
+    modules = Image.frombytes("L", (n, n), bytes(0 if cell else 255 for r in matrix for cell in r))
+    # butun songa kattalashtirish: NEAREST har modulni box x box blokka aylantiradi
+    code = modules.resize((n * box, n * box), Image.NEAREST).convert("1")
+    img = Image.new("1", (size, size), 1)
+    offset = (size - n * box) // 2
+    img.paste(code, (offset, offset))
+    return img
+
+
+def qr_image(payload, size):
+    key = (payload, size)
+    with _lock:
+        img = _cache.get(key)
+        if img is not None:
+            _cache.move_to_end(key)
+            metrics.incr("qr.hits")
+            return img
+    metrics.incr("qr.misses")
+    with metrics.timed("qr.render_seconds"):
+        img = render_qr(payload, size)
+    with _lock:
+        _cache[key] = img
+        while len(_cache) > _max_entries:
+            _cache.popitem(last=False)
+    return img
+
+
+def cache_info():
+    with _lock:
+        return {"entries": len(_cache), "max_entries": _max_entries}
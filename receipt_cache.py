@@ -0,0 +1,152 @@
+"""
+Chek rasmlari keshi (sale_id bo'yicha).
+
+Sotuv checkout'dan keyin o'zgarmaydi, shuning uchun chek bir marta
+chiziladi va saqlanadi:
+- xotira: LRU, RECEIPT_CACHE_MAX_BYTES (default 32 MB) bilan cheklangan;
+- disk (ixtiyoriy): RECEIPT_CACHE_DIR berilsa, fayllar kontent xeshi
+  (sha256) nomi bilan saqlanadi, `sale-<id>.ref` esa xeshga ishora qiladi.
+ETag — PNG baytlarining sha256 xeshi.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+
+class CachedReceipt:
+    __slots__ = ("key", "data", "etag")
+
+    def __init__(self, key, data, etag):
+        self.key = key
+        self.data = data
+        self.etag = etag
+
+    def as_file(self, filename):
+        buf = io.BytesIO(self.data)
+        buf.name = filename
+        return buf
+
+
+class ReceiptCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # --- memory tier ---
+    def _remember(self, entry):
+        with self._lock:
+            old = self._items.pop(entry.key, None)
+            if old is not None:
+                self._size -= len(old.data)
+            self._items[entry.key] = entry
+            self._size += len(entry.data)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted.data)
+                metrics.incr("receipt_cache.evictions")
+
+    def _lookup_memory(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+            return entry
+
+    # --- disk tier ---
+    def _ref_path(self, key):
+        return os.path.join(self.disk_dir, f"sale-{key}.ref")
+
+    def _blob_path(self, etag):
+        return os.path.join(self.disk_dir, f"{etag}.png")
+
+    def _lookup_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._ref_path(key), "r", encoding="ascii") as f:
+                etag = f.read().strip()
+            with open(self._blob_path(etag), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return CachedReceipt(key, data, etag)
+
+    def _store_disk(self, entry):
+        if not self.disk_dir:
+            return
+        try:
+            blob = self._blob_path(entry.etag)
+            if not os.path.exists(blob):
+                tmp = blob + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(entry.data)
+                os.replace(tmp, blob)
+            tmp = self._ref_path(entry.key) + ".tmp"
+            with open(tmp, "w", encoding="ascii") as f:
+                f.write(entry.etag)
+            os.replace(tmp, self._ref_path(entry.key))
+        except OSError as e:
+            print("⚠️ Chek keshini diskka yozishda xato:", e)
+
+    # --- public API ---
+    def get(self, key):
+        entry = self._lookup_memory(key)
+        if entry is not None:
+            metrics.incr("receipt_cache.hits_memory")
+            return entry
+        entry = self._lookup_disk(key)
+        if entry is not None:
+            metrics.incr("receipt_cache.hits_disk")
+            self._remember(entry)
+        return entry
+
+    def put(self, key, data):
+        entry = CachedReceipt(key, data, hashlib.sha256(data).hexdigest())
+        self._remember(entry)
+        self._store_disk(entry)
+        return entry
+
+    def get_or_render(self, key, render):
+        """
+        render() -> PNG bytes yoki None (sotuv topilmasa).
+        Bir xil chekni bir vaqtda ikki marta chizmaslik uchun key bo'yicha lock.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            lock = self._render_locks.setdefault(key, threading.Lock())
+        with lock:
+            entry = self.get(key)
+            if entry is None:
+                metrics.incr("receipt_cache.misses")
+                with metrics.timed("receipt_cache.render_seconds"):
+                    data = render()
+                if data is not None:
+                    entry = self.put(key, data)
+        with self._lock:
+            self._render_locks.pop(key, None)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+def from_env():
+    cache = ReceiptCache(
+        max_bytes=int(os.getenv("RECEIPT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        disk_dir=os.getenv("RECEIPT_CACHE_DIR") or None,
+    )
+    metrics.register_gauge("receipt_cache", cache.stats)
+    return cache
@@ -0,0 +1,176 @@
+"""
+Bot cheklarini fonda yuborish (polling oqimi kutib qolmasligi uchun).
+
+- Cheklangan navbat (RECEIPT_QUEUE_SIZE, default 100) + RECEIPT_WORKERS
+  (default 2) ta worker oqimi.
+- Telegram xatolarida qayta urinish: 429 — retry_after qadar kutiladi,
+  5xx va tarmoq xatolari — eksponensial backoff (1s, 2s, 4s ... + jitter);
+  boshqa 4xx qayta urinilmaydi.
+- Backpressure: navbat to'lsa submit() False qaytaradi va chek chaqiruvchi
+  oqimda darhol yuboriladi (yo'qolmaydi); metrics: receipt_delivery.*
+  (navbat chuqurligi gauge, kutish/yuborish histogram, rejected hisobi).
+"""
+import io
+import os
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+import message_chunks
+import metrics
+
+# parts: ("text",), ("photo",) yoki ("text", "photo") — shu tartibda yuboriladi.
+# done_text: oxirida yuboriladigan xabar (reply_markup bilan).
+ReceiptJob = namedtuple(
+    "ReceiptJob",
+    ["chat_id", "sale_id", "sale", "items", "parts", "reply_markup", "done_text", "queued_at"],
+)
+
+PHOTO_CAPTION = "🧾 Sizning chek (rasm)"
+
+
+class ReceiptDelivery:
+    def __init__(self, bot, render_text, render_png, workers=2, maxsize=100, max_attempts=4, base_delay=1.0):
+        """
+        render_text(job) -> str, render_png(job) -> PNG bytes yoki None.
+        """
+        self.bot = bot
+        self.render_text = render_text
+        self.render_png = render_png
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    # --- sending ---
+    def _retry_delay(self, attempt, exc):
+        if isinstance(exc, ApiTelegramException):
+            if exc.error_code == 429:
+                params = (exc.result_json or {}).get("parameters") or {}
+                return float(params.get("retry_after") or self.base_delay)
+            if exc.error_code < 500:
+                return None
+        elif not isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+            return None
+        return self.base_delay * (2 ** attempt) + random.uniform(0, self.base_delay)
+
+    def _send(self, call):
+        """call() har urinishda qaytadan chaqiriladi (fayl oqimi yangidan ochilishi uchun)."""
+        for attempt in range(self.max_attempts):
+            try:
+                with metrics.timed("receipt_delivery.send_seconds"):
+                    return call()
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None or attempt == self.max_attempts - 1:
+                    raise
+                metrics.incr("receipt_delivery.retries")
+                time.sleep(delay)
+
+    def _png(self, job):
+        try:
+            return self.render_png(job)
+        except Exception as e:
+            print("Chek rasmini chizishda xato:", e)
+            return None
+
+    def deliver(self, job):
+        bot = self.bot
+        chat_id = job.chat_id
+        last = len(job.parts) - 1
+        for i, part in enumerate(job.parts):
+            markup = job.reply_markup if (i == last and not job.done_text) else None
+            try:
+                if part == "photo":
+                    png = self._png(job)
+                    if png is not None:
+                        def send_photo(png=png, markup=markup):
+                            buf = io.BytesIO(png)
+                            buf.name = f"receipt_{job.sale_id}.png"
+                            return bot.send_photo(chat_id, buf, caption=PHOTO_CAPTION, reply_markup=markup)
+                        self._send(send_photo)
+                        continue
+                    if "text" in job.parts:
+                        continue  # matnli chek allaqachon bor
+                # ko'p qatorli chek 4096 belgidan oshsa — bir nechta xabar
+                chunks = message_chunks.split_message(self.render_text(job))
+                for j, chunk in enumerate(chunks):
+                    chunk_markup = markup if j == len(chunks) - 1 else None
+                    self._send(lambda: bot.send_message(chat_id, chunk, parse_mode="HTML", reply_markup=chunk_markup))
+            except Exception as e:
+                metrics.incr("receipt_delivery.failed")
+                print(f"Chekni yuborishda xato (sale {job.sale_id}, {part}):", e)
+        if job.done_text:
+            try:
+                self._send(lambda: bot.send_message(chat_id, job.done_text, reply_markup=job.reply_markup))
+            except Exception as e:
+                print("Yakuniy xabarni yuborishda xato:", e)
+
+    # --- queue ---
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            try:
+                metrics.histogram("receipt_delivery.queue_wait_seconds").observe(time.monotonic() - job.queued_at)
+                self.deliver(job)
+            except Exception as e:
+                print("Receipt worker xatosi:", e)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                self._queue.task_done()
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"receipt-delivery-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        metrics.register_gauge("receipt_delivery", self.stats)
+
+    def submit(self, chat_id, sale_id, sale, items, parts, reply_markup=None, done_text=None):
+        """
+        Navbatga qo'yadi. Worker'lar ishlamayotgan yoki navbat to'la bo'lsa —
+        shu oqimda yuboradi. Qaytaradi: True — navbatga qo'yildi.
+        """
+        job = ReceiptJob(chat_id, sale_id, sale, items, tuple(parts), reply_markup, done_text, time.monotonic())
+        if self._threads:
+            try:
+                self._queue.put_nowait(job)
+                metrics.incr("receipt_delivery.queued")
+                return True
+            except queue.Full:
+                metrics.incr("receipt_delivery.rejected")
+        self.deliver(job)
+        return False
+
+    def stats(self):
+        with self._lock:
+            busy = self._busy
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "busy_workers": busy,
+            "workers": len(self._threads),
+        }
+
+
+def from_env(bot, render_text, render_png):
+    return ReceiptDelivery(
+        bot,
+        render_text,
+        render_png,
+        workers=int(os.getenv("RECEIPT_WORKERS", "2")),
+        maxsize=int(os.getenv("RECEIPT_QUEUE_SIZE", "100")),
+    )
@@ -0,0 +1,261 @@
+"""
+Chek rasmi uchun layout engine (bot.py va web_app.py uchun umumiy).
+
+Har bir blok bir marta o'lchanadi va joylashtirilgan buyruqlar ro'yxatiga
+(matn/chiziq + koordinata) aylantiriladi; rasm keyin shu ro'yxatdan
+chiziladi. 80mm natija avvalgi ikki bosqichli renderer bilan piksel-piksel
+bir xil (jumladan, balandlik hisobidagi eski formulalar ham saqlangan).
+
+Qog'oz kengligi: RECEIPT_PAPER=80mm (default) yoki 58mm.
+Chiqish: 1-bit PNG (render_receipt_png) yoki termal printer uchun ESC/POS
+raster (escpos_raster).
+"""
+import io
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from PIL import Image, ImageDraw
+
+import qr_code
+from core.periods import local_tz
+from render_text import get_font, measure_text
+
+Paper = namedtuple("Paper", [
+    "width", "padding", "gap",
+    "font_brand", "font_title", "font_bold", "font", "font_small",
+    "col_qty_w", "col_price_w", "col_total_w",
+    "head_h", "qr_size", "min_height",
+])
+
+PAPER_SIZES = {
+    # 80mm termal chek: 576px
+    "80mm": Paper(576, 22, 8, 34, 24, 22, 20, 18, 60, 90, 90, 26, 180, 720),
+    # 58mm termal chek: 384px
+    "58mm": Paper(384, 12, 6, 26, 18, 16, 15, 14, 44, 76, 80, 20, 140, 480),
+}
+
+# 1-bit chiqish: shu qiymatdan och piksellar oq
+MONO_THRESHOLD = 160
+# ESC/POS GS v 0: ko'p printerlar bitta buyruqda cheklangan balandlikni qabul qiladi
+ESCPOS_BAND_HEIGHT = 256
+
+# draw ops
+TEXT = "text"
+LINE = "line"
+
+Layout = namedtuple("Layout", ["width", "height", "ops", "qr_payload", "qr_size", "qr_xy"])
+
+
+def format_som_plain(v: int) -> str:
+    try:
+        return f"{int(v):,}".replace(",", " ")
+    except Exception:
+        return str(v)
+
+
+def wrap_text(text, font, max_width):
+    """
+    So'zlar bo'yicha satrlarga bo'lish. Har bir satr uchun sig'adigan eng
+    uzun so'zlar prefiksi binary search bilan topiladi (O(log n) o'lchash),
+    natija avvalgi ketma-ket (greedy) algoritm bilan bir xil.
+    """
+    words = (text or "").split()
+    if not words:
+        return [""]
+    lines = []
+    i = 0
+    n = len(words)
+    while i < n:
+        lo, hi = i + 1, n          # words[i:lo] har doim olinadi (uzun so'z ham)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if measure_text(None, " ".join(words[i:mid]), font)[0] <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        lines.append(" ".join(words[i:lo]))
+        i = lo
+    return lines
+
+
+def _height(text, font):
+    return measure_text(None, text, font)[1]
+
+
+def _width(text, font):
+    return measure_text(None, text, font)[0]
+
+
+def layout_receipt(sale_id, sale, items, seller_display, paper=None):
+    p = PAPER_SIZES[paper or os.getenv("RECEIPT_PAPER", "80mm")]
+    W, P, GAP = p.width, p.padding, p.gap
+
+    font_brand = get_font(p.font_brand)
+    font_title = get_font(p.font_title)
+    font_bold = get_font(p.font_bold)
+    font = get_font(p.font)
+    font_small = get_font(p.font_small)
+
+    col_qty_w, col_price_w, col_total_w = p.col_qty_w, p.col_price_w, p.col_total_w
+    col_name_w = W - (P * 2) - (col_qty_w + col_price_w + col_total_w)
+
+    created = sale.get("created_at")
+    if isinstance(created, datetime):
+        # sales.created_at — UTC (naive); vaqt zonasi receipt_text bilan bir xil
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        created_local = created.astimezone(local_tz())
+    else:
+        created_local = datetime.now(local_tz())
+
+    cust_line = f"{sale.get('cust_name') or '-'} {sale.get('cust_phone') or ''}".strip()
+    total_amount = int(sale.get("total_amount") or 0)
+    pay_type = (sale.get("payment_type") or "-").upper()
+
+    ops = []
+    y = P
+    # canvas balandligi eski formulada hisoblanadi (pikselga mos bo'lishi uchun)
+    H = P
+
+    def hr():
+        nonlocal y, H
+        y += 6
+        ops.append((LINE, (P, y, W - P, y), 2))
+        y += 12
+        H += 18
+
+    def center(text, fnt):
+        nonlocal y, H
+        tw, th = measure_text(None, text, fnt)
+        ops.append((TEXT, ((W - tw) // 2, y), text, fnt))
+        y += th + GAP
+        H += th + GAP
+
+    def kv(k, v, fnt, extra, sep):
+        nonlocal y, H
+        left = f"{k}{sep}"
+        v = str(v)
+        ops.append((TEXT, (P, y), left, fnt))
+        vw, vh = measure_text(None, v, fnt)
+        ops.append((TEXT, (W - P - vw, y), v, fnt))
+        y += max(_height(left, fnt), vh) + extra
+        H += _height(f"{k}{sep} {v}", fnt) + extra
+
+    def table_head():
+        nonlocal y, H
+        ops.append((TEXT, (P, y), "ITEM", font_bold))
+        ops.append((TEXT, (P + col_name_w + 10, y), "QTY", font_bold))
+        ops.append((TEXT, (P + col_name_w + 10 + col_qty_w, y), "PRICE", font_bold))
+        ops.append((TEXT, (W - P - col_total_w + 10, y), "TOTAL", font_bold))
+        y += p.head_h
+        ops.append((LINE, (P, y, W - P, y), 1))
+        y += 10
+        H += p.head_h + 10
+
+    def row(name, qty=None, price=None, total=None):
+        nonlocal y, H
+        ops.append((TEXT, (P, y), name, font))
+        if qty is not None:
+            ops.append((TEXT, (P + col_name_w + 10 + (col_qty_w - _width(qty, font)) // 2, y), qty, font))
+        if price is not None:
+            ops.append((TEXT, (P + col_name_w + 10 + col_qty_w + (col_price_w - _width(price, font)), y), price, font))
+        if total is not None:
+            ops.append((TEXT, (W - P - _width(total, font), y), total, font))
+        nh = _height(name, font)
+        y += nh + 6
+        H += nh + 6
+
+    center("SRM", font_brand)
+    center("SALES RECEIPT", font_title)
+    hr()
+
+    kv("Chek ID", f"#{sale_id}", font, 6, ":")
+    kv("Sana", created_local.strftime("%d.%m.%Y %H:%M"), font, 6, ":")
+    kv("To'lov", pay_type, font_bold, 6, ":")
+    kv("Sotuvchi", seller_display, font_small, 6, ":")
+    kv("Mijoz", cust_line, font_small, 6, ":")
+
+    hr()
+    table_head()
+
+    for it in items:
+        name = str(it.get("name") or "").strip()
+        qty = int(it.get("qty") or 0)
+        price = int(it.get("price") or 0)
+        total = int(it.get("total") or (qty * price))
+        name_lines = wrap_text(name, font, col_name_w)
+        row(name_lines[0], str(qty), format_som_plain(price), format_som_plain(total))
+        for extra in name_lines[1:]:
+            row(extra)
+
+    hr()
+    kv("JAMI", f"{format_som_plain(total_amount)} so'm", font_brand, 10, "")
+    hr()
+    center("Tashrifingiz uchun rahmat!", font_small)
+
+    qr_size = p.qr_size
+    H += qr_size + 30 + P
+    H = max(p.min_height, H)
+
+    qr_payload = f"SRM|sale:{sale_id}|total:{total_amount}|time:{created_local.strftime('%Y-%m-%d %H:%M')}"
+    qr_xy = ((W - qr_size) // 2, H - qr_size - P - 10)
+    return Layout(W, H, ops, qr_payload, qr_size, qr_xy)
+
+
+def draw_layout(layout):
+    # kulrang (L): antialias matn uchun yetarli, RGB dan 3 barobar kichik
+    img = Image.new("L", (layout.width, layout.height), 255)
+    draw = ImageDraw.Draw(img)
+    for op in layout.ops:
+        if op[0] == TEXT:
+            _, xy, text, fnt = op
+            draw.text(xy, text, font=fnt, fill=0)
+        else:
+            _, coords, width = op
+            draw.line(coords, fill=0, width=width)
+
+    # QR
+    try:
+        img.paste(qr_code.qr_image(layout.qr_payload, layout.qr_size), layout.qr_xy)
+    except Exception as e:
+        print("QR chizishda xato:", e)
+    return img
+
+
+def to_mono(img, threshold=MONO_THRESHOLD):
+    """1-bit (qora/oq) — dithering'siz, matn chekkalari aniq qoladi."""
+    return img.convert("L").point(lambda v: 255 if v >= threshold else 0, mode="1")
+
+
+def render_receipt_png(sale_id, sale, items, seller_display, paper=None):
+    img = to_mono(draw_layout(layout_receipt(sale_id, sale, items, seller_display, paper)))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def escpos_raster(png_bytes, band_height=ESCPOS_BAND_HEIGHT):
+    """
+    PNG chek -> ESC/POS bayt oqimi: ESC @, `GS v 0` raster bloklari
+    (band_height qatordan), oxirida qog'oz surish va qisman kesish.
+    Printerga to'g'ridan-to'g'ri yuboriladi (masalan, `cat receipt.bin > /dev/usb/lp0`).
+    """
+    img = to_mono(Image.open(io.BytesIO(png_bytes)))
+    width, height = img.size
+    width_bytes = (width + 7) // 8
+    if width % 8:
+        padded = Image.new("1", (width_bytes * 8, height), 1)
+        padded.paste(img, (0, 0))
+        img = padded
+    # PIL "1": bit 1 = oq; ESC/POS: bit 1 = qora nuqta
+    data = bytes(b ^ 0xFF for b in img.tobytes())
+
+    out = bytearray(b"\x1b@")
+    for top in range(0, height, band_height):
+        rows = min(band_height, height - top)
+        out += b"\x1dv0\x00" + bytes((width_bytes & 0xFF, width_bytes >> 8, rows & 0xFF, rows >> 8))
+        out += data[top * width_bytes:(top + rows) * width_bytes]
+    out += b"\x1bd\x04"      # 4 qator surish
+    out += b"\x1dVB\x00"     # qisman kesish
+    return bytes(out)
@@ -0,0 +1,109 @@
+"""
+Pillow matn chizish yordamchilari (chek, ombor va statistika rasmlari uchun).
+
+- get_font(size): har bir (path, size) shrift bir marta yuklanadi.
+- measure_text(draw, text, font): o'lchash usuli import paytida bir marta
+  tanlanadi (Pillow versiyasiga qarab), natijalar cheklangan LRU keshda.
+"""
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",  # juda tiniq
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+
+MEASURE_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=None)
+def _font_path():
+    """Birinchi ochiladigan shrift yo'li (None — hech biri topilmadi)."""
+    for path in FONT_CANDIDATES:
+        try:
+            ImageFont.truetype(path, 12)
+            return path
+        except Exception:
+            continue
+    return None
+
+
+@lru_cache(maxsize=64)
+def get_font(size=16):
+    """
+    Foydalaniladigan shrift: LiberationSans-Bold (aniq va kattaroq chiqadi).
+    Agar u topilmasa — DejaVuSans fallback ishlaydi.
+    """
+    path = _font_path()
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except Exception:
+            pass
+    return ImageFont.load_default()
+
+
+# Scratch canvas: o'lchash natijasi qaysi rasmga chizilishiga bog'liq emas (RGB).
+_SCRATCH = ImageDraw.Draw(Image.new("RGB", (1, 1), "white"))
+
+
+def _by_textbbox(text, font):
+    bbox = _SCRATCH.textbbox((0, 0), text, font=font)
+    return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def _by_textsize(text, font):
+    size = _SCRATCH.textsize(text, font=font)
+    return (size[0], size[1])
+
+
+def _by_getbbox(text, font):
+    bbox = font.getbbox(text)
+    return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def _by_getsize(text, font):
+    size = font.getsize(text)
+    return (size[0], size[1])
+
+
+def _approximate(text, font):
+    approx_w = int(len(text) * (getattr(font, "size", 12) * 0.6))
+    approx_h = int((getattr(font, "size", 12)) * 1.2)
+    return (approx_w, approx_h)
+
+
+def _pick_strategy():
+    probe = get_font(16)
+    for fn in (_by_textbbox, _by_textsize, _by_getbbox, _by_getsize):
+        try:
+            fn("Ag 1", probe)
+            return fn
+        except Exception:
+            continue
+    return _approximate
+
+
+MEASURE_STRATEGY = _pick_strategy()
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def _measure(font, text):
+    try:
+        return MEASURE_STRATEGY(text, font)
+    except Exception:
+        return _approximate(text, font)
+
+
+def measure_text(draw, text, font):
+    """
+    Cross-version Pillow text measurement helper.
+    Returns (width, height). `draw` faqat eski chaqiruvlar bilan moslik uchun.
+    """
+    return _measure(font, text)
+
+
+def cache_info():
+    return {"fonts": get_font.cache_info()._asdict(), "measure": _measure.cache_info()._asdict()}
@@ -0,0 +1,200 @@
+"""
+Bot suhbat holati (USER_STATE o'rniga): set/get/clear, idle-TTL bilan.
+
+Backend (.env):
+  BOT_STATE_BACKEND    memory (default) yoki postgres
+  BOT_STATE_TTL        shuncha soniya murojaat qilinmagan holat o'chadi (default 3600)
+  BOT_STATE_MAX_USERS  memory: ko'pi bilan shuncha foydalanuvchi, LRU (default 10000)
+  BOT_STATE_CACHE      postgres: jarayon ichidagi o'qish keshi, soniya (default 2)
+
+postgres — UNLOGGED bot_state jadvali: bir nechta bot worker'lari holatni
+bo'lishadi, restartdan keyin ham saqlanadi (server crash'da yo'qolishi mumkin).
+Handler filtrlari har xabarda get_state ni ko'p marta chaqiradi, shuning
+uchun o'qishlar qisqa muddat lokal keshlanadi (o'z yozuvlarimiz darhol).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from psycopg2.extras import Json
+
+import metrics
+from db import get_conn
+
+
+class MemoryStateStore:
+    def __init__(self, ttl=3600, max_users=10000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._data = OrderedDict()  # user_id -> (state dict, last_touch)
+        self._lock = threading.Lock()
+
+    def _live(self, user_id):
+        item = self._data.get(user_id)
+        if item is None:
+            return None
+        if time.monotonic() - item[1] > self.ttl:
+            del self._data[user_id]
+            metrics.incr("bot_state.expired")
+            return None
+        return item[0]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._data:
+            user_id, (_, touched) = next(iter(self._data.items()))
+            if len(self._data) <= self.max_users and now - touched <= self.ttl:
+                break
+            del self._data[user_id]
+            metrics.incr("bot_state.evicted")
+
+    def set(self, user_id, key, value):
+        with self._lock:
+            state = self._live(user_id) or {}
+            state[key] = value
+            self._data[user_id] = (state, time.monotonic())
+            self._data.move_to_end(user_id)
+            self._evict()
+
+    def get(self, user_id, key, default=None):
+        with self._lock:
+            state = self._live(user_id)
+            if state is None:
+                return default
+            self._data[user_id] = (state, time.monotonic())
+            self._data.move_to_end(user_id)
+            return state.get(key, default)
+
+    def clear(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "users": len(self._data)}
+
+
+class PostgresStateStore:
+    """
+    bot_state (user_id, data JSONB, updated_at). TTL — oxirgi murojaatdan
+    (set yoki get) beri, MemoryStateStore bilan bir xil; get updated_at'ni
+    TOUCH_EVERY soniyada ko'pi bilan bir marta yangilaydi. Eskilari o'qishda
+    e'tiborsiz qoldiriladi va vaqti-vaqti bilan o'chiriladi.
+    """
+
+    SWEEP_EVERY = 300
+    TOUCH_EVERY = 60
+
+    def __init__(self, ttl=3600, cache_seconds=2.0):
+        self.ttl = ttl
+        self.cache_seconds = cache_seconds
+        self._cache = {}  # user_id -> (state dict, fetched_at)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _remember(self, user_id, state):
+        with self._lock:
+            self._cache[user_id] = (state, time.monotonic())
+            if len(self._cache) > 10000:
+                cutoff = time.monotonic() - self.cache_seconds
+                self._cache = {k: v for k, v in self._cache.items() if v[1] >= cutoff}
+
+    def _load(self, user_id):
+        with self._lock:
+            item = self._cache.get(user_id)
+        if item is not None and time.monotonic() - item[1] <= self.cache_seconds:
+            return item[0]
+        conn = get_conn()
+        cur = conn.cursor()
+        # o'qish ham holatni "tirik" saqlaydi (faqat o'qiydigan uzun checkout o'chib qolmasin)
+        cur.execute(
+            """
+            WITH live AS (
+                SELECT data, updated_at FROM bot_state
+                WHERE user_id = %(uid)s AND updated_at > (now() AT TIME ZONE 'UTC') - %(ttl)s * interval '1 second'
+            ),
+            touched AS (
+                UPDATE bot_state s
+                SET updated_at = now() AT TIME ZONE 'UTC'
+                FROM live
+                WHERE s.user_id = %(uid)s
+                  AND live.updated_at < (now() AT TIME ZONE 'UTC') - %(touch)s * interval '1 second'
+                RETURNING 1
+            )
+            SELECT data FROM live;
+            """,
+            {"uid": user_id, "ttl": self.ttl, "touch": min(self.TOUCH_EVERY, self.ttl / 10)},
+        )
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+        conn.close()
+        state = row[0] if row else {}
+        self._remember(user_id, state)
+        return state
+
+    def _maybe_sweep(self, cur):
+        now = time.monotonic()
+        if now - self._last_sweep < self.SWEEP_EVERY:
+            return
+        self._last_sweep = now
+        cur.execute(
+            "DELETE FROM bot_state WHERE updated_at < (now() AT TIME ZONE 'UTC') - %s * interval '1 second';",
+            (self.ttl,),
+        )
+        if cur.rowcount:
+            metrics.incr("bot_state.expired", cur.rowcount)
+
+    def set(self, user_id, key, value):
+        conn = get_conn()
+        cur = conn.cursor()
+        # muddati o'tgan holat ustiga qo'shilmaydi — yangidan boshlanadi
+        cur.execute(
+            """
+            INSERT INTO bot_state AS s (user_id, data, updated_at)
+            VALUES (%(uid)s, %(data)s, now() AT TIME ZONE 'UTC')
+            ON CONFLICT (user_id) DO UPDATE
+            SET data = CASE
+                    WHEN s.updated_at > (now() AT TIME ZONE 'UTC') - %(ttl)s * interval '1 second'
+                    THEN s.data || EXCLUDED.data
+                    ELSE EXCLUDED.data
+                END,
+                updated_at = EXCLUDED.updated_at
+            RETURNING data;
+            """,
+            {"uid": user_id, "data": Json({key: value}), "ttl": self.ttl},
+        )
+        state = cur.fetchone()[0]
+        self._maybe_sweep(cur)
+        conn.commit()
+        cur.close()
+        conn.close()
+        self._remember(user_id, state)
+
+    def get(self, user_id, key, default=None):
+        return self._load(user_id).get(key, default)
+
+    def clear(self, user_id):
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM bot_state WHERE user_id = %s;", (user_id,))
+        conn.commit()
+        cur.close()
+        conn.close()
+        self._remember(user_id, {})
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "postgres", "cached_users": len(self._cache)}
+
+
+def from_env():
+    backend = os.getenv("BOT_STATE_BACKEND", "memory").strip().lower()
+    ttl = int(os.getenv("BOT_STATE_TTL", "3600"))
+    if backend == "postgres":
+        store = PostgresStateStore(ttl=ttl, cache_seconds=float(os.getenv("BOT_STATE_CACHE", "2")))
+    else:
+        store = MemoryStateStore(ttl=ttl, max_users=int(os.getenv("BOT_STATE_MAX_USERS", "10000")))
+    metrics.register_gauge("bot_state", store.stats)
+    return store
@@ -0,0 +1,189 @@
+"""
+Kunlik savdo yig'indisi (sales_daily_rollup) va statistika so'rovlari.
+
+- record_sale(cur, sale_id): checkout tranzaksiyasi ichida chaqiriladi,
+  sotuv qatorlarini (kun, mahsulot) bo'yicha jadvalga qo'shadi.
+- generate_stats_df(start, end): o'tgan kunlar rollup'dan, bugungi kun esa
+  sale_items'dan jonli o'qiladi (kun aniqligida, TIMEZONE bo'yicha).
+  DATABASE_REPLICA_URL berilsa o'qish replikadan (db.get_read_conn).
+- seed_if_empty(conn): init_db'da — rollup bo'sh, sotuvlar bor bo'lsa (yangi
+  deploy) butun tarix backfill qilinadi; hisobotlar nol ko'rsatmaydi.
+- Backfill (qayta hisoblash uchun):
+      python stats_rollup.py backfill [--from 2024-01-01] [--to 2024-12-31]
+
+sales.created_at UTC deb hisoblanadi (server now()).
+"""
+import argparse
+from datetime import datetime, date, timedelta
+
+from psycopg2.extras import RealDictCursor
+
+from core.lazy import lazy_import
+from core.periods import day_range_utc, local_today, local_tz, local_tz_name
+from db import get_conn, get_read_conn
+
+# pandas faqat generate_stats_df'da kerak
+pd = lazy_import("pandas")
+
+STATS_COLUMNS = ["product_id", "name", "sold_qty", "cost_price", "total_sold", "total_cost", "profit"]
+
+
+def _local_date(dt):
+    if isinstance(dt, datetime):
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(local_tz())
+        return dt.date()
+    return dt
+
+
+_ROLLUP_SELECT = """
+    SELECT (s.created_at AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s)::date AS day,
+           COALESCE(si.product_id, 0) AS product_id,
+           COALESCE(si.name, '') AS name,
+           SUM(si.qty) AS qty,
+           SUM(si.total) AS revenue,
+           SUM(si.qty * COALESCE(p.cost_price, 0)) AS cost
+    FROM sale_items si
+    JOIN sales s ON s.id = si.sale_id
+    LEFT JOIN products p ON p.id = si.product_id
+"""
+
+
+def record_sale(cur, sale_id):
+    """Checkout ichida: sotuvni rollup'ga qo'shadi (tannarx shu paytdagi cost_price)."""
+    cur.execute(
+        """
+        INSERT INTO sales_daily_rollup AS r (day, product_id, name, qty, revenue, cost)
+        """ + _ROLLUP_SELECT + """
+        WHERE si.sale_id = %(sale_id)s
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, product_id, name) DO UPDATE
+        SET qty = r.qty + EXCLUDED.qty,
+            revenue = r.revenue + EXCLUDED.revenue,
+            cost = r.cost + EXCLUDED.cost,
+            updated_at = now();
+        """,
+        {"tz": local_tz_name(), "sale_id": sale_id},
+    )
+
+
+def backfill(conn, start_day=None, end_day=None):
+    """[start_day, end_day) oralig'ini sale_items'dan qayta hisoblaydi. Qaytaradi: yozilgan qatorlar soni."""
+    start_day = start_day or date(1970, 1, 1)
+    end_day = end_day or (local_today() + timedelta(days=1))
+    start_utc, _ = day_range_utc(start_day)
+    end_utc, _ = day_range_utc(end_day)
+    cur = conn.cursor()
+    cur.execute("DELETE FROM sales_daily_rollup WHERE day >= %s AND day < %s;", (start_day, end_day))
+    cur.execute(
+        "INSERT INTO sales_daily_rollup (day, product_id, name, qty, revenue, cost)\n"
+        + _ROLLUP_SELECT
+        + """
+        WHERE s.created_at >= %(start)s AND s.created_at < %(end)s
+        GROUP BY 1, 2, 3;
+        """,
+        {"tz": local_tz_name(), "start": start_utc, "end": end_utc},
+    )
+    count = cur.rowcount
+    cur.close()
+    return count
+
+
+def seed_if_empty(conn):
+    """Rollup bo'sh bo'lsa sale_items'dan to'ldiradi (commit chaqiruvchida). Qaytaradi: qatorlar soni."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM sales_daily_rollup) OR NOT EXISTS (SELECT 1 FROM sales);")
+        if cur.fetchone()[0]:
+            return 0
+        # record_sale (checkout) kutadi — shu paytdagi sotuv ikki marta sanalmasin
+        cur.execute("LOCK TABLE sales_daily_rollup IN EXCLUSIVE MODE;")
+        cur.execute("SELECT EXISTS (SELECT 1 FROM sales_daily_rollup);")
+        if cur.fetchone()[0]:
+            return 0
+    finally:
+        cur.close()
+    count = backfill(conn)
+    print(f"✅ sales_daily_rollup bo'sh edi — {count} ta qator to'ldirildi")
+    return count
+
+
+def generate_stats_df(start_dt, end_dt):
+    start_day = _local_date(start_dt)
+    end_day = _local_date(end_dt)
+    today = local_today()
+    today_start, today_end = day_range_utc(today)
+    include_today = start_day <= today < end_day
+
+    conn = get_read_conn()  # replika bo'lsa undan (db.py)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        """
+        SELECT product_id, name,
+               SUM(qty) AS sold_qty,
+               SUM(revenue) AS total_sold,
+               SUM(cost) AS total_cost
+        FROM (
+            SELECT product_id, name, qty, revenue, cost
+            FROM sales_daily_rollup
+            WHERE day >= %(start)s AND day < LEAST(%(end)s, %(today)s)
+            UNION ALL
+            SELECT COALESCE(si.product_id, 0), COALESCE(si.name, ''), si.qty, si.total,
+                   si.qty * COALESCE(p.cost_price, 0)
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            LEFT JOIN products p ON p.id = si.product_id
+            WHERE %(include_today)s AND s.created_at >= %(today_start)s AND s.created_at < %(today_end)s
+        ) x
+        GROUP BY product_id, name
+        ORDER BY name;
+        """,
+        {
+            "start": start_day,
+            "end": end_day,
+            "today": today,
+            "include_today": include_today,
+            "today_start": today_start,
+            "today_end": today_end,
+        },
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    if not rows:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+
+    df = pd.DataFrame(rows)
+    df["product_id"] = df["product_id"].astype(int).where(df["product_id"] != 0, None)
+    df["sold_qty"] = df["sold_qty"].astype(int)
+    df["total_sold"] = df["total_sold"].astype(int)
+    df["total_cost"] = df["total_cost"].astype(int)
+    df["cost_price"] = (df["total_cost"] // df["sold_qty"].where(df["sold_qty"] != 0, 1)).astype(int)
+    df["profit"] = df["total_sold"] - df["total_cost"]
+    return df[STATS_COLUMNS]
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="sales_daily_rollup jadvalini boshqarish")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    bf = sub.add_parser("backfill", help="sale_items'dan qayta hisoblash")
+    bf.add_argument("--from", dest="start", type=date.fromisoformat, default=None)
+    bf.add_argument("--to", dest="end", type=date.fromisoformat, default=None, help="(kiritilmaydi)")
+    args = parser.parse_args()
+
+    if args.cmd == "backfill":
+        conn = get_conn()
+        try:
+            count = backfill(conn, args.start, args.end)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"✅ sales_daily_rollup: {count} ta qator yozildi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Kam qolgan mahsulotlar haqida ogohlantirish (ALLOWED_USERS / ADMIN_IDS ga).
+
+- products.reorder_level — mahsulot bo'yicha chegara (default 5; Excel importda
+  "reorder_level"/"min_qoldiq" ustuni, web'da mahsulot qo'shish formasi).
+- Faqat checkout tegan mahsulotlar tekshiriladi: ombor UPDATE'i RETURNING bilan
+  qty <= reorder_level belgisini qaytaradi (checkout._reserve_stock), chegaradan
+  tushganlar CheckoutResult.low_stock da keladi. Davriy to'liq skan yo'q.
+- Yuborish fonda: STOCK_ALERT_BATCH_SECONDS (default 5) ichida kelganlar
+  bitta xabarga yig'iladi, keyin low_stock_alerts'ga yoziladi (PK bo'yicha
+  de-dup: bot va web jarayonlari bir mahsulotni ikki marta xabar qilmaydi).
+- Mahsulot bir marta xabar qilinadi, tugaganda (qty=0) yana bir marta. Kirimdan
+  keyin qoldiq chegaradan oshsa yozuv trigger bilan o'chadi (db_init.sql).
+- Yozuv (claim) yuborishdan oldin commit qilinadi — Telegram kutilayotganda
+  low_stock_alerts qatorlari qulflanib turmaydi. Hech kimga yetkazilmasa yozuv
+  qisqa ikkinchi tranzaksiyada o'chiriladi — keyingi sotuvda qayta urinadi.
+"""
+import html
+import os
+import threading
+import time
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+import message_chunks
+import metrics
+from db import get_conn
+
+# db_init.sql dagi products.reorder_level DEFAULT bilan bir xil
+DEFAULT_REORDER_LEVEL = 5
+
+_RECORD_SQL = """
+    WITH low AS (
+        INSERT INTO low_stock_alerts AS a (product_id, qty, reorder_level)
+        SELECT p.id, p.qty, p.reorder_level
+        FROM products p
+        WHERE p.id = ANY(%s) AND p.qty <= p.reorder_level
+        ON CONFLICT (product_id) DO UPDATE
+        SET qty = EXCLUDED.qty, reorder_level = EXCLUDED.reorder_level, alerted_at = now()
+        WHERE a.qty > 0 AND EXCLUDED.qty = 0
+        RETURNING a.product_id, a.qty, a.reorder_level, a.alerted_at
+    )
+    SELECT low.product_id, p.name, low.qty, low.reorder_level, low.alerted_at
+    FROM low
+    JOIN products p ON p.id = low.product_id
+    ORDER BY low.qty, p.name;
+"""
+
+
+def record_alerts(cur, product_ids):
+    """Hali xabar qilinmagan kam qolganlarni yozadi. Qaytaradi: shu mahsulotlar (dict)."""
+    if not product_ids:
+        return []
+    cur.execute(_RECORD_SQL, (sorted(set(product_ids)),))
+    return cur.fetchall()
+
+
+def alert_text(alerts):
+    lines = ["⚠️ <b>Kam qolgan mahsulotlar</b>"]
+    for a in alerts:
+        name = html.escape(a["name"] or f"#{a['product_id']}")
+        if a["qty"] <= 0:
+            lines.append(f"❌ {name} — tugadi")
+        else:
+            lines.append(f"• {name} — {a['qty']} dona qoldi (chegara {a['reorder_level']})")
+    return "\n".join(lines)
+
+
+def release_alerts(cur, alerts):
+    """Yetkazilmagan claim'larni o'chiradi (boshqa jarayon yangilagan bo'lsa tegmaydi)."""
+    execute_values(
+        cur,
+        """
+        DELETE FROM low_stock_alerts a
+        USING (VALUES %s) AS v(product_id, alerted_at)
+        WHERE a.product_id = v.product_id AND a.alerted_at = v.alerted_at;
+        """,
+        [(a["product_id"], a["alerted_at"]) for a in alerts],
+        template="(%s::int, %s::timestamp)",
+    )
+
+
+class AlertSender:
+    def __init__(self, bot, recipients, batch_seconds=5.0):
+        self.bot = bot
+        self.recipients = list(recipients)
+        self.batch_seconds = float(batch_seconds)
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, product_ids):
+        if not product_ids:
+            return
+        with self._cond:
+            self._pending.update(product_ids)
+            self._cond.notify()
+        metrics.incr("stock_alerts.checked", len(product_ids))
+
+    def _send(self, text):
+        delivered = 0
+        for chat_id in self.recipients:
+            try:
+                message_chunks.send_long_message(self.bot, chat_id, text)
+                delivered += 1
+            except Exception as e:
+                metrics.incr("stock_alerts.failed")
+                print(f"Kam qoldiq xabarini yuborishda xato ({chat_id}):", e)
+        return delivered
+
+    def flush(self, product_ids):
+        """Claim commit -> yuborish (tranzaksiyasiz) -> yetmasa claim o'chiriladi."""
+        conn = get_conn()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            alerts = record_alerts(cur, product_ids)
+            conn.commit()
+            if not alerts:
+                return
+            if self._send(alert_text(alerts)):
+                metrics.incr("stock_alerts.sent", len(alerts))
+                return
+            release_alerts(cur, alerts)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print("Kam qoldiq tekshiruvida xato:", e)
+        finally:
+            cur.close()
+            conn.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # shu oraliqda kelgan sotuvlar ham bitta xabarga tushadi
+            time.sleep(self.batch_seconds)
+            with self._cond:
+                batch, self._pending = self._pending, set()
+            self.flush(batch)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stock-alerts", daemon=True)
+            self._thread.start()
+
+
+_SENDER = None
+
+
+def install(bot, recipients):
+    """Checkout commit'lariga ulanadi; bir jarayonda bir marta (qayta chaqiruv e'tiborsiz)."""
+    global _SENDER
+    if _SENDER is not None:
+        return _SENDER
+    import checkout
+
+    _SENDER = AlertSender(bot, recipients, os.getenv("STOCK_ALERT_BATCH_SECONDS", "5"))
+    _SENDER.start()
+    checkout.on_commit(lambda result: _SENDER.submit(result.low_stock))
+    return _SENDER
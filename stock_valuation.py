@@ -0,0 +1,106 @@
+"""
+Ombor qiymati: qoldiq x tannarx (USD va so'm), mahsulot bo'yicha va jami.
+
+- products.stock_value_usd / stock_value — generated ustunlar (qty x cost_price_usd,
+  qty x cost_price); eksportda har bir qatorda chiqadi.
+- stock_valuation_slots — jami SLOTS ta qatorga bo'lingan; products'dagi har bir
+  statement'dan keyin trigger delta'ni pg_backend_pid() % SLOTS slotiga qo'shadi
+  (db_init.sql). Parallel checkout'lar bitta qator lock'ida kutmaydi.
+  summary() — SLOTS ta qatorning SUM'i, mahsulotlar soniga bog'liq emas.
+- Qayta hisoblash (masalan TRUNCATE yoki qo'lda tuzatishdan keyin):
+      python stock_valuation.py rebuild
+"""
+import argparse
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_conn
+
+# db_init.sql dagi stock_valuation_slots CHECK va pg_backend_pid() % 16 bilan bir xil
+SLOTS = 16
+
+_SUM_SQL = """
+    SELECT COALESCE(SUM(products), 0) AS products, COALESCE(SUM(in_stock), 0) AS in_stock,
+           COALESCE(SUM(total_qty), 0) AS total_qty, COALESCE(SUM(value_usd), 0) AS value_usd,
+           COALESCE(SUM(value), 0) AS value, MAX(updated_at) AS updated_at
+    FROM stock_valuation_slots;
+"""
+
+_EMPTY = {"products": 0, "in_stock": 0, "total_qty": 0, "value_usd": 0, "value": 0, "updated_at": None}
+
+
+def summary():
+    """Qaytaradi: products, in_stock, total_qty, value_usd, value, updated_at."""
+    conn = get_conn()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(_SUM_SQL)
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return row or dict(_EMPTY)
+
+
+def rebuild(conn):
+    """Slotlarni products'dan qayta hisoblaydi (jami 0-slotga). Qaytaradi: yangi qiymatlar."""
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    # hisoblash paytida products o'zgarmasin (trigger'lar kutib turadi)
+    cur.execute("LOCK TABLE products IN SHARE MODE;")
+    cur.execute(
+        """
+        INSERT INTO stock_valuation_slots AS v (slot, products, in_stock, total_qty, value_usd, value, updated_at)
+        SELECT g.slot,
+               CASE WHEN g.slot = 0 THEN t.products ELSE 0 END,
+               CASE WHEN g.slot = 0 THEN t.in_stock ELSE 0 END,
+               CASE WHEN g.slot = 0 THEN t.total_qty ELSE 0 END,
+               CASE WHEN g.slot = 0 THEN t.value_usd ELSE 0 END,
+               CASE WHEN g.slot = 0 THEN t.value ELSE 0 END,
+               now()
+        FROM generate_series(0, %s - 1) AS g(slot),
+             (SELECT COUNT(*) AS products, COUNT(*) FILTER (WHERE qty > 0) AS in_stock,
+                     COALESCE(SUM(qty), 0) AS total_qty, COALESCE(SUM(stock_value_usd), 0) AS value_usd,
+                     COALESCE(SUM(stock_value), 0) AS value
+              FROM products) AS t
+        ON CONFLICT (slot) DO UPDATE
+        SET products = EXCLUDED.products,
+            in_stock = EXCLUDED.in_stock,
+            total_qty = EXCLUDED.total_qty,
+            value_usd = EXCLUDED.value_usd,
+            value = EXCLUDED.value,
+            updated_at = EXCLUDED.updated_at;
+        """,
+        (SLOTS,),
+    )
+    cur.execute(_SUM_SQL)
+    row = cur.fetchone()
+    cur.close()
+    return row
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Ombor qiymati (stock_valuation_slots) boshqaruvi")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="products'dan qayta hisoblash")
+    sub.add_parser("show", help="joriy jami qiymatlar")
+    args = parser.parse_args()
+
+    if args.cmd == "rebuild":
+        conn = get_conn()
+        try:
+            row = rebuild(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        row = summary()
+    print(
+        f"📦 {row['products']} ta mahsulot ({row['in_stock']} tasi omborda), {row['total_qty']} dona\n"
+        f"💵 {row['value_usd']:,.2f} $\n"
+        f"💰 {row['value']:,} so'm".replace(",", " ")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+USD kursi servisi (Markaziy bank API), bot.py va web_app.py uchun umumiy.
+
+- get_usd_rate() hech qachon tarmoqni kutmaydi (bazadan yoki xotiradan
+  birinchi marta yuklashdan tashqari): kurs eskirgan bo'lsa eski qiymat
+  qaytariladi va yangilash fon oqimida boshlanadi (stale-while-revalidate).
+- Har bir olingan kurs `usd_rates` jadvaliga yoziladi, restartdan keyin
+  oxirgi kurs bazadan o'qiladi.
+- CBU_RATE_URL bilan manzilni almashtirish mumkin (masalan cbu_stub.py).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+import metrics
+from db import get_conn
+
+DEFAULT_URL = "https://cbu.uz/uz/arkhiv-kursov-valyut/json/USD/"
+FALLBACK_RATE = 12800.0
+
+
+class UsdRateService:
+    def __init__(self, url=None, ttl=timedelta(hours=24), connect_timeout=3.0, read_timeout=5.0):
+        self._url = url
+        self.ttl = ttl
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate = None
+        self.fetched_at = None          # UTC
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded = False
+        self._cold_tried = False
+        self._thread = None
+
+    @property
+    def url(self):
+        return self._url or os.getenv("CBU_RATE_URL", DEFAULT_URL)
+
+    # --- storage ---
+    def _load_last(self):
+        try:
+            conn = get_conn()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT rate, fetched_at FROM usd_rates ORDER BY fetched_at DESC LIMIT 1;")
+                row = cur.fetchone()
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print("⚠️ Kursni bazadan o'qishda xato:", e)
+            return
+        if row:
+            with self._lock:
+                if self.rate is None:
+                    self.rate = float(row[0])
+                    self.fetched_at = row[1]
+
+    def _save(self, rate, rate_date):
+        try:
+            conn = get_conn()
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    """
+                    INSERT INTO usd_rates (rate_date, rate, fetched_at, source)
+                    VALUES (%s, %s, now() AT TIME ZONE 'UTC', %s)
+                    ON CONFLICT (rate_date) DO UPDATE
+                    SET rate = EXCLUDED.rate, fetched_at = EXCLUDED.fetched_at, source = EXCLUDED.source;
+                    """,
+                    (rate_date, rate, self.url),
+                )
+                conn.commit()
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print("⚠️ Kursni bazaga yozishda xato:", e)
+
+    # --- network ---
+    def fetch(self):
+        with metrics.timed("usd_rate.fetch_seconds"):
+            resp = requests.get(self.url, timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+        if not isinstance(data, list) or not data:
+            raise ValueError(f"Kutilmagan javob: {data!r}")
+        rate = float(data[0]["Rate"])
+        try:
+            rate_date = datetime.strptime(data[0].get("Date", ""), "%d.%m.%Y").date()
+        except ValueError:
+            rate_date = datetime.utcnow().date()
+        return rate, rate_date
+
+    def refresh(self):
+        try:
+            rate, rate_date = self.fetch()
+        except Exception as e:
+            metrics.incr("usd_rate.fetch_errors")
+            print("⚠️ Kurs olishda xato:", e)
+            return None
+        with self._lock:
+            self.rate = rate
+            self.fetched_at = datetime.utcnow()
+        self._save(rate, rate_date)
+        print(f"💰 USD kursi yangilandi: 1 USD = {rate} so'm")
+        return rate
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="usd-rate-refresh", daemon=True).start()
+
+    def is_stale(self):
+        return self.fetched_at is None or datetime.utcnow() - self.fetched_at >= self.ttl
+
+    def get(self):
+        if not self._loaded:
+            self._loaded = True
+            self._load_last()
+        if self.rate is None:
+            # birinchi ishga tushish: bazada ham kurs yo'q — faqat bir marta kutamiz
+            if not self._cold_tried:
+                self._cold_tried = True
+                return self.refresh() or FALLBACK_RATE
+            self._refresh_in_background()
+            return FALLBACK_RATE
+        if self.is_stale():
+            metrics.incr("usd_rate.stale_hits")
+            self._refresh_in_background()
+        return self.rate
+
+    def start(self, check_every=1800):
+        """Fon oqimi: kursni eskirmasdan oldin yangilab turadi."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                try:
+                    if not self._loaded:
+                        self._loaded = True
+                        self._load_last()
+                    ahead = self.ttl - timedelta(seconds=check_every)
+                    if self.fetched_at is None or datetime.utcnow() - self.fetched_at >= ahead:
+                        self.refresh()
+                except Exception as e:
+                    print("⚠️ usd_rate refresher:", e)
+                time.sleep(check_every)
+
+        self._thread = threading.Thread(target=loop, name="usd-rate-refresher", daemon=True)
+        self._thread.start()
+
+
+_SERVICE = UsdRateService()
+
+
+def get_usd_rate():
+    """USD kursi (so'm). Tarmoqni kutmaydi, eskirgan bo'lsa fonda yangilanadi."""
+    return _SERVICE.get()
+
+
+def start_refresher():
+    _SERVICE.start()
@@ -0,0 +1,128 @@
+"""
+Bot uchun webhook rejimi: kichik WSGI ilova (long polling o'rniga).
+
+- POST <WEBHOOK_PATH> (default /telegram/webhook): sarlavhadagi
+  X-Telegram-Bot-Api-Secret-Token WEBHOOK_SECRET bilan solishtiriladi
+  (mos kelmasa 403), update navbatga qo'yiladi va darhol 200 qaytadi —
+  handler'lar dispatcher.py worker'larida ishlaydi.
+- Telegram qayta yuborgan update'lar (so'nggi 1000 ta update_id) tashlanadi.
+- Boshqa yo'llar `fallback` WSGI ilovaga (masalan web_app.app.wsgi_app)
+  o'tkaziladi — web bilan bitta jarayonda ishlatish mumkin.
+
+Lokal sinov: python webhook_replay.py fixtures/telegram/*.json
+"""
+import hmac
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from telebot import types
+
+import metrics
+
+MAX_BODY_BYTES = 1024 * 1024
+SECRET_HEADER = "HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN"
+
+
+def _respond(start_response, status, body=b""):
+    start_response(status, [("Content-Type", "text/plain; charset=utf-8"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+class WebhookApp:
+    def __init__(self, bot, secret, path="/telegram/webhook", fallback=None, dedup_size=1000):
+        if not secret:
+            raise ValueError("WEBHOOK_SECRET bo'sh bo'lmasligi kerak")
+        self.bot = bot
+        self.secret = secret.encode("utf-8")
+        self.path = path
+        self.fallback = fallback
+        self.dedup_size = dedup_size
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_duplicate(self, update_id):
+        with self._lock:
+            if update_id in self._seen:
+                return True
+            self._seen[update_id] = True
+            if len(self._seen) > self.dedup_size:
+                self._seen.popitem(last=False)
+            return False
+
+    def _forget(self, update_id):
+        with self._lock:
+            self._seen.pop(update_id, None)
+
+    def _authorized(self, environ):
+        token = environ.get(SECRET_HEADER, "").encode("utf-8")
+        return hmac.compare_digest(token, self.secret)
+
+    def handle(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") != "POST":
+            return _respond(start_response, "405 Method Not Allowed")
+        if not self._authorized(environ):
+            metrics.incr("webhook.forbidden")
+            return _respond(start_response, "403 Forbidden")
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > MAX_BODY_BYTES:
+            return _respond(start_response, "400 Bad Request")
+        try:
+            payload = json.loads(environ["wsgi.input"].read(length))
+            update = types.Update.de_json(payload)
+        except Exception:
+            metrics.incr("webhook.bad_request")
+            return _respond(start_response, "400 Bad Request")
+
+        if self._is_duplicate(update.update_id):
+            metrics.incr("webhook.duplicates")
+            return _respond(start_response, "200 OK", b"ok")
+
+        metrics.incr("webhook.updates")
+        try:
+            with metrics.timed("webhook.enqueue_seconds"):
+                # dispatcher o'rnatilgan bo'lsa — faqat shard navbatiga qo'yadi
+                self.bot.process_new_updates([update])
+        except Exception:
+            # Telegram 500 dan keyin qayta yuboradi — u dublikat deb tashlanmasin
+            self._forget(update.update_id)
+            raise
+        return _respond(start_response, "200 OK", b"ok")
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") == self.path:
+            return self.handle(environ, start_response)
+        if self.fallback is not None:
+            return self.fallback(environ, start_response)
+        return _respond(start_response, "404 Not Found")
+
+
+def from_env(bot, fallback=None):
+    return WebhookApp(
+        bot,
+        os.getenv("WEBHOOK_SECRET", ""),
+        path=os.getenv("WEBHOOK_PATH", "/telegram/webhook"),
+        fallback=fallback,
+    )
+
+
+def register(bot, app):
+    """Telegram'ga webhook manzilini aytadi: WEBHOOK_URL (https://host) + path."""
+    base = os.getenv("WEBHOOK_URL", "").rstrip("/")
+    if not base:
+        print("⚠️ WEBHOOK_URL berilmagan — set_webhook chaqirilmadi (lokal sinov rejimi)")
+        return False
+    bot.set_webhook(url=base + app.path, secret_token=app.secret.decode("utf-8"))
+    print(f"✅ Webhook: {base + app.path}")
+    return True
+
+
+def serve(app, host="0.0.0.0", port=None):
+    from werkzeug.serving import run_simple
+
+    port = int(port or os.getenv("PORT", "8080"))
+    run_simple(host, port, app, threaded=True, use_reloader=False)
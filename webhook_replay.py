@@ -0,0 +1,59 @@
+"""
+Yozib olingan Telegram update JSON'larini webhook'ga yuborish (lokal sinov).
+
+    BOT_MODE=webhook python bot.py          # WEBHOOK_URL bo'lmasa set_webhook chaqirilmaydi
+    python webhook_replay.py fixtures/telegram/*.json [--url http://127.0.0.1:8080/telegram/webhook]
+
+Har bir fayl bitta update; --user bilan from/chat id almashtiriladi,
+--fresh-ids har safar yangi update_id beradi (aks holda qayta yuborilganlar
+dedup bilan tashlanadi).
+"""
+import argparse
+import json
+import os
+import time
+
+import requests
+from dotenv import load_dotenv
+
+
+def _with_user(payload, user_id):
+    for obj in payload.values():
+        if not isinstance(obj, dict):
+            continue
+        if "from" in obj:
+            obj["from"]["id"] = user_id
+        chat = obj.get("chat") or (obj.get("message") or {}).get("chat")
+        if chat and chat.get("type") == "private":
+            chat["id"] = user_id
+    return payload
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Telegram update fixture'larini webhook'ga yuborish")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.getenv('PORT', '8080')}"
+                                        f"{os.getenv('WEBHOOK_PATH', '/telegram/webhook')}")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    parser.add_argument("--user", type=int, default=None, help="from/chat id ni almashtirish")
+    parser.add_argument("--fresh-ids", action="store_true", help="update_id ni vaqtdan yangilash")
+    parser.add_argument("--delay", type=float, default=0.2, help="update'lar orasidagi pauza, soniya")
+    args = parser.parse_args()
+
+    base_id = int(time.time() * 1000)
+    for i, path in enumerate(args.files):
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if args.user:
+            payload = _with_user(payload, args.user)
+        if args.fresh_ids:
+            payload["update_id"] = base_id + i
+        start = time.perf_counter()
+        r = requests.post(args.url, json=payload, headers={"X-Telegram-Bot-Api-Secret-Token": args.secret}, timeout=10)
+        print(f"{r.status_code} {(time.perf_counter() - start) * 1000:6.1f} ms  {path}")
+        time.sleep(args.delay)
+
+
+if __name__ == "__main__":
+    main()